@@ -0,0 +1,221 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sys
+
+import chess
+import chess.pgn
+
+import utils
+
+constants = utils.load_constants()
+
+DEFAULT_CHUNKSIZE = 8  # Positions sent to a worker at once; consecutive positions of a game share its warm table
+
+
+def read_epd(f):
+    """Yields (id, fen, played move) of each EPD line, the id taken from its id opcode if it has one."""
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+
+        if not line or line.startswith('#'):
+            continue
+
+        board, operations = chess.Board.from_epd(line)
+        yield str(operations.get("id", f"line {line_number}")), board.fen(), None
+
+
+def read_pgn(f):
+    """Yields (id, fen, played move) of the position before each move of each game's mainline."""
+    game_number = 0
+
+    while (game := chess.pgn.read_game(f)) is not None:
+        game_number += 1
+        board = game.board()
+
+        for ply, move in enumerate(game.mainline_moves()):
+            yield f"game {game_number} ply {ply}", board.fen(), move.uci()
+            board.push(move)
+
+
+def read_move_lists(f):
+    """Yields (id, fen, played move) of the position before each move of games written as SAN lists, like games.txt."""
+    for line_number, line in enumerate(f, 1):
+        board = chess.Board()
+
+        for ply, san in enumerate(line.split()):
+            if san in ("1-0", "0-1", "1/2-1/2", "*"):
+                break
+
+            move = board.parse_san(san)
+            yield f"line {line_number} ply {ply}", board.fen(), move.uci()
+            board.push(move)
+
+
+def read_positions(filepath):
+    """
+    Reads the positions to analyze, by file extension: .epd, .pgn, or anything else as move lists.
+    :return: list of (id, fen, played move or None)
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    reader = {".epd": read_epd, ".pgn": read_pgn}.get(extension, read_move_lists)
+
+    with open(filepath, 'r') as f:
+        return list(reader(f))
+
+
+def read_completed(output_filepath):
+    """
+    Reads the results of an earlier, interrupted run. A line cut off by the interruption is dropped from the file, so
+    new results can be appended after the complete ones.
+    :return: Set of the input indices already analyzed
+    """
+    if not os.path.exists(output_filepath):
+        return set()
+
+    completed = set()
+    lines = []
+
+    with open(output_filepath, 'r') as f:
+        for line in f:
+            try:
+                completed.add(json.loads(line)["index"])
+            except (json.JSONDecodeError, KeyError):
+                break
+
+            lines.append(line)
+
+    with open(output_filepath, 'w') as f:
+        f.writelines(lines)
+
+    return completed
+
+
+def init_worker(hash_size_mb, allow_tablebase):
+    """Sets up a worker's engine once, so its transposition table stays warm across the positions it analyzes."""
+    global engine_options
+    import minimax
+    from transposition_table import TranspositionTable
+
+    minimax.num_helper_threads = 0
+    minimax.transposition_table = TranspositionTable(hash_size_mb)  # Never share a persisted table between workers
+    engine_options = {"allow_tablebase": allow_tablebase}
+
+
+def format_eval(score):
+    """Score from white's perspective, as centipawns or as the side that mates (1 for white, -1 for black)."""
+    if isinstance(score, str):
+        return {"eval": score}
+
+    if math.isinf(score):
+        return {"mate": 1 if score > 0 else -1}
+
+    return {"cp": round(score * 100)}
+
+
+def analyze_position(task):
+    """
+    Searches one position in a worker.
+    :param task: (index, id, fen, played move, depth, seconds, nodes)
+    :return: dict of the result, ready to be written as a JSONL line, with the move in UCI notation
+    """
+    import minimax
+    from time_manager import TimeManager
+
+    index, position_id, fen, played, depth, seconds, nodes = task
+    board = chess.Board(fen)
+
+    result = {"index": index, "id": position_id, "fen": fen}
+
+    if played is not None:
+        result["played"] = played
+
+    if board.is_game_over():
+        result["outcome"] = board.result()
+        return result
+
+    time_manager = TimeManager(seconds, max_nodes=nodes)
+    search = minimax.find_move(board, depth, seconds, allow_book=False, print_updates=False, time_manager=time_manager,
+                               **engine_options)
+
+    result.update({
+        "move": utils.parse_move(board, search["move"]).uci(),
+        **format_eval(search["eval"]),
+        "depth": search["depth"],
+        "nodes": time_manager.nodes,
+        "seconds": round(time_manager.elapsed(), 3)
+    })
+
+    return result
+
+
+def analyze(positions, output_filepath, *, depth=constants.max_depth, seconds=None, nodes=None, workers=None,
+            ordered=True, hash_size_mb=constants.hash_size_mb, allow_tablebase=False, chunksize=DEFAULT_CHUNKSIZE,
+            print_progress=True):
+    """
+    Analyzes positions in a pool of worker processes, appending each result to output_filepath as a JSON line as soon
+    as it is ready. Positions already in output_filepath are skipped, so an interrupted run picks up where it stopped.
+    :param positions: list of (id, fen, played move or None), as returned by read_positions
+    :param depth: Deepest iteration to search each position to
+    :param seconds: Time budget per position, or None
+    :param nodes: Node budget per position, or None
+    :param workers: Number of worker processes, defaults to the number of CPUs
+    :param ordered: Write results in input order; otherwise in the order they complete, which keeps every worker busy
+    :param hash_size_mb: Size of each worker's transposition table
+    :return: Number of positions analyzed by this run
+    """
+    completed = read_completed(output_filepath)
+    tasks = [(index, position_id, fen, played, depth, seconds, nodes)
+             for index, (position_id, fen, played) in enumerate(positions) if index not in completed]
+
+    if print_progress and completed:
+        print(f"Resuming: {len(completed)} of {len(positions)} positions already analyzed")
+
+    if not tasks:
+        return 0
+
+    with multiprocessing.Pool(workers or os.cpu_count(), initializer=init_worker,
+                              initargs=(hash_size_mb, allow_tablebase)) as pool, \
+            open(output_filepath, 'a') as output:
+        imap = pool.imap if ordered else pool.imap_unordered
+
+        for done, result in enumerate(imap(analyze_position, tasks, chunksize), 1):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+
+            if print_progress:
+                print(f"\r{len(completed) + done}/{len(positions)}", end='', file=sys.stderr)
+
+    if print_progress:
+        print(file=sys.stderr)
+
+    return len(tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyzes every position of an EPD, PGN or move list file in "
+                                                 "parallel, writing one JSON line per position.")
+    parser.add_argument("input", help="An .epd or .pgn file, or a file of SAN move lists like games.txt")
+    parser.add_argument("output", help="JSONL file to write; an existing partial output is resumed")
+    parser.add_argument("--depth", type=int, default=constants.max_depth, help="Depth to search each position to")
+    parser.add_argument("--time", type=float, help="Seconds to search each position for")
+    parser.add_argument("--nodes", type=int, help="Nodes to search each position for")
+    parser.add_argument("--workers", type=int, help="Worker processes, defaults to the number of CPUs")
+    parser.add_argument("--hash", type=int, default=constants.hash_size_mb,
+                        help="Transposition table size of each worker, in MB")
+    parser.add_argument("--unordered", action="store_true", help="Write results as they complete, not in input order")
+    parser.add_argument("--tablebase", action="store_true", help="Look up positions with 7 or fewer pieces")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Consecutive positions sent to a worker at once")
+    args = parser.parse_args()
+
+    positions = read_positions(args.input)
+    analyze(positions, args.output, depth=args.depth, seconds=args.time, nodes=args.nodes, workers=args.workers,
+            ordered=not args.unordered, hash_size_mb=args.hash, allow_tablebase=args.tablebase,
+            chunksize=args.chunksize)
+
+
+if __name__ == '__main__':
+    main()
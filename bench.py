@@ -0,0 +1,210 @@
+import argparse
+import json
+import sys
+import time
+
+import chess
+
+import minimax
+from time_manager import TimeManager
+from transposition_table import TranspositionTable
+
+DEFAULT_DEPTH = 3
+DEFAULT_TOLERANCE = 0.05  # Fraction NPS may drop by before it counts as a regression
+
+POSITIONS = [
+    # Openings
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "rnbqkbnr/pp1ppppp/8/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2",
+    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+    "rnbqkb1r/pppppppp/5n2/8/2PP4/8/PP2PPPP/RNBQKBNR b KQkq - 0 2",
+    "rnbqkb1r/ppp1pppp/5n2/3p4/3P1B2/5N2/PPP1PPPP/RN1QKB1R b KQkq - 3 3",
+    "r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/3P1N2/PPP2PPP/RNBQK2R w KQkq - 1 5",
+    "rnbqk2r/ppp1ppbp/3p1np1/8/2PPP3/2N5/PP3PPP/R1BQKBNR w KQkq - 0 5",
+    "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4",
+    # Middlegames
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 10",
+    "4rrk1/pp1n3p/3q2pQ/2p1pb2/2PP4/2P3N1/P2B2PP/4RRK1 b - - 7 19",
+    "rq3rk1/ppp2ppp/1bnpb3/3N2B1/3NP3/7P/PPPQ1PP1/2KR3R w - - 7 14",
+    "r1bq1r1k/1pp1n1pp/1p1p4/4p2Q/4Pp2/1BNP4/PPP2PPP/3R1RK1 w - - 2 14",
+    "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15",
+    "r1bbk1nr/pp3p1p/2n5/1N4p1/2Np1B2/8/PPP2PPP/2KR1B1R w kq - 0 13",
+    "r1bq1rk1/ppp1nppp/4n3/3p3Q/3P4/1BP1B3/PP1N2PP/R4RK1 w - - 1 16",
+    "4r1k1/r1q2ppp/ppp2n2/4P3/5Rb1/1N1BQ3/PPP3PP/R5K1 w - - 1 17",
+    "2rqkb1r/ppp2p2/2npb1p1/1N1Nn2p/2P1PP2/8/PP2B1PP/R1BQK2R b KQ - 0 11",
+    "r1bq1r1k/b1p1npp1/p2p3p/1p6/3PP3/1B2NN2/PP3PPP/R2Q1RK1 w - - 1 16",
+    "3r1rk1/p5pp/bpp1pp2/8/q1PP1P2/b3P3/P2NQRPP/1R2B1K1 b - - 6 22",
+    "r1q2rk1/2p1bppp/2Pp4/p6b/Q1PNp3/4B3/PP1R1PPP/2K4R w - - 2 18",
+    "4k2r/1pb2ppp/1p2p3/1R1p4/3P4/2r1PN2/P4PPP/1R4K1 b - - 3 22",
+    "3q2k1/pb3p1p/4pbp1/2r5/PpN2N2/1P2P2P/5PP1/Q2R2K1 b - - 4 26",
+    "r3k2r/3nnpbp/q2pp1p1/p7/Pp1PPPP1/4BNN1/1P5P/R2Q1RK1 w kq - 0 16",
+    # Tactical
+    "rnbqkbnr/ppp2ppp/8/1B1pp3/4P3/8/PPPP1PPP/RNBQK1NR b KQkq - 1 3",
+    "5rk1/q6p/2p3bR/1pPp1rP1/1P1Pp3/P3B1Q1/1K3P2/R7 w - - 93 90",
+    "4rrk1/1p1nq3/p7/2p1P1pp/3P2bp/3Q1Bn1/PPPB4/1K2R1NR w - - 40 21",
+    "3Qb1k1/1r2ppb1/pN1n2q1/Pp1Pp1Pr/4P2p/4BP2/4B1R1/1R5K b - - 11 40",
+    "4k3/3q1r2/1N2r1b1/3ppN2/2nPP3/1B1R2n1/2R1Q3/3K4 w - - 5 1",
+    "1r3k2/4q3/2Pp3b/3Bp3/2Q2p2/1p1P2P1/1P2KP2/3N4 w - - 0 1",
+    "6k1/6p1/P6p/r1N5/5p2/7P/1b3PP1/4R1K1 w - - 0 1",
+    # Endgames
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 11",
+    "6k1/6p1/6Pp/ppp5/3pn2P/1P3K2/1PP2P2/3N4 b - - 0 1",
+    "3b4/5kp1/1p1p1p1p/pP1PpP1P/P1P1P3/3KN3/8/8 w - - 0 1",
+    "2K5/p7/7P/5pR1/8/5k2/r7/8 w - - 4 3",
+    "8/6pk/1p6/8/PP3p1p/5P2/4KP1q/3Q4 w - - 0 1",
+    "7k/3p2pp/4q3/8/4Q3/5Kp1/P6b/8 w - - 0 1",
+    "8/2p5/8/2kPKp1p/2p4P/2P5/3P4/8 w - - 0 1",
+    "8/1p3pp1/7p/5P1P/2k3P1/8/2K2P2/8 w - - 0 1",
+    "8/pp2r1k1/2p1p3/3pP2p/1P1P1P1P/P5KR/8/8 w - - 0 1",
+    "5k2/7R/4P2p/5K2/p1r2P1p/8/8/8 b - - 0 1",
+    "8/3p3B/5p2/5P2/p7/PP5b/k7/6K1 w - - 0 1",
+    "8/8/8/4k3/8/8/8/4K2Q w - - 0 1",
+    "8/8/8/8/4k3/8/4P3/4K3 w - - 0 1",
+]
+
+
+def bench_position(fen, depth, collect_stats=False):
+    """
+    Searches a position to a fixed depth from an empty transposition table.
+    :param collect_stats: Add the search's SearchStats, as a dict, to the result
+    :return: dict with the fen, move, nodes, qnodes, seconds and nps
+    """
+    board = chess.Board(fen)
+    time_manager = TimeManager()
+
+    minimax.new_game()
+
+    start_time = time.perf_counter()
+    result = minimax.find_move(board, depth, None, allow_book=False, allow_tablebase=False, print_updates=False,
+                               time_manager=time_manager, collect_stats=collect_stats)
+    seconds = time.perf_counter() - start_time
+
+    report = {
+        "fen": fen,
+        "move": result["move"],
+        "nodes": time_manager.nodes,
+        "qnodes": time_manager.qnodes,
+        "seconds": seconds,
+        "nps": round(time_manager.nodes / seconds) if seconds > 0 else 0
+    }
+
+    if collect_stats:
+        report["stats"] = result["stats"].as_dict()
+
+    return report
+
+
+def bench(depth=DEFAULT_DEPTH, positions=POSITIONS, print_progress=True, collect_stats=False):
+    """
+    Runs the bench. Searches are single-threaded, and book and tablebase are disabled, so the node counts only depend
+    on the search and evaluation code. Collecting stats slows the search down, so NPS is not comparable with a report
+    made without them.
+    :return: dict with the depth, per-position results, totals and signature (the total node count)
+    """
+    minimax.num_helper_threads = 0
+    minimax.transposition_table = TranspositionTable()  # Never touch a persisted table
+
+    results = []
+
+    if print_progress:
+        print(f"{'#':>3} {'nodes':>9} {'qnodes':>9} {'ms':>8} {'nps':>7}  move   fen")
+
+    for i, fen in enumerate(positions, 1):
+        result = bench_position(fen, depth, collect_stats)
+        results.append(result)
+
+        if print_progress:
+            print(f"{i:>3} {result['nodes']:>9} {result['qnodes']:>9} {result['seconds'] * 1000:>8.0f} "
+                  f"{result['nps']:>7}  {result['move']:<6} {fen}")
+
+    nodes = sum(result["nodes"] for result in results)
+    seconds = sum(result["seconds"] for result in results)
+
+    return {
+        "depth": depth,
+        "positions": results,
+        "nodes": nodes,
+        "qnodes": sum(result["qnodes"] for result in results),
+        "seconds": seconds,
+        "nps": round(nodes / seconds) if seconds > 0 else 0,
+        "signature": nodes
+    }
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares a bench report against a baseline report. A changed signature is not a regression by itself, it means the
+    search tree changed; per-position timings are too noisy to compare, so only the total NPS is checked.
+    :param tolerance: Fraction the NPS may drop by before it is a regression
+    :return: (regressions, positions whose node count changed as (fen, baseline nodes, nodes))
+    """
+    if report["depth"] != baseline["depth"]:
+        return [f"Baseline was run at depth {baseline['depth']}, not {report['depth']}"], []
+
+    regressions = []
+
+    if report["nps"] < baseline["nps"] * (1 - tolerance):
+        regressions.append(f"NPS dropped from {baseline['nps']} to {report['nps']} "
+                           f"({report['nps'] / baseline['nps'] - 1:+.1%})")
+
+    baseline_nodes = {result["fen"]: result["nodes"] for result in baseline["positions"]}
+    changed = [(result["fen"], baseline_nodes[result["fen"]], result["nodes"]) for result in report["positions"]
+               if result["fen"] in baseline_nodes and baseline_nodes[result["fen"]] != result["nodes"]]
+
+    return regressions, changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Searches a fixed set of positions and reports nodes per second.")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="Depth to search each position to")
+    parser.add_argument("--baseline", help="Report to compare against; exits with 1 on a regression")
+    parser.add_argument("--save", help="Write the report to this file, e.g. to use as a baseline later")
+    parser.add_argument("--stats", action="store_true", help="Collect search statistics into the report")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Fraction the NPS may drop by before it is a regression")
+    args = parser.parse_args()
+
+    report = bench(args.depth, collect_stats=args.stats)
+
+    print()
+    print(f"Nodes:     {report['nodes']} ({report['qnodes']} quiescence)")
+    print(f"Time:      {report['seconds']:.2f} s")
+    print(f"NPS:       {report['nps']}")
+    print(f"Signature: {report['signature']}")
+
+    if args.stats:
+        totals = {key: sum(result["stats"][key] for result in report["positions"])
+                  for key in ("tt_probes", "tt_hits", "beta_cutoffs", "first_move_cutoffs")}
+
+        print(f"TT hits:   {totals['tt_hits'] / max(1, totals['tt_probes']):.1%}")
+        print(f"First move beta cutoffs: {totals['first_move_cutoffs'] / max(1, totals['beta_cutoffs']):.1%}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+        regressions, changed = compare(report, baseline, args.tolerance)
+
+        if baseline["signature"] == report["signature"]:
+            print("Signature matches the baseline")
+        else:
+            print(f"Signature changed from {baseline['signature']}: the search tree is different")
+
+        for fen, baseline_nodes, nodes in changed:
+            print(f"  {baseline_nodes} -> {nodes} nodes: {fen}")
+
+        print(f"NPS {report['nps']} vs. {baseline['nps']} in the baseline ({report['nps'] / baseline['nps'] - 1:+.1%})")
+
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,12 @@
 class TablebaseLookupError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when it has been told to stop."""
+    pass
+
+
+class ZobristHashMismatch(Exception):
+    """Raised by ZobristHash in debug mode when an incrementally updated hash differs from one computed from scratch."""
+    pass
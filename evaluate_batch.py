@@ -0,0 +1,62 @@
+import chess
+import numpy as np
+
+from evaluate_position import PIECE_SQUARE_VALUES
+
+# Planes of the position tensor: white pawn, knight, bishop, rook, queen, king, then the same for black
+PLANES = [(color, piece_type) for color in (chess.WHITE, chess.BLACK) for piece_type in chess.PIECE_TYPES]
+
+# Material plus piece map value of each (plane, square), positive is good for white
+WEIGHTS = np.array([PIECE_SQUARE_VALUES[color][piece_type] for color, piece_type in PLANES], dtype=np.float64)
+
+
+def piece_bitboards(occupied_white, occupied_black, pawns, knights, bishops, rooks, queens, kings):
+    """
+    Splits the board bitboards of many positions into one bitboard per plane.
+    :param occupied_white: Array of N occupied_co[chess.WHITE] bitboards
+    :param occupied_black: Array of N occupied_co[chess.BLACK] bitboards
+    :return: (N, 12) uint64 array, ordered as PLANES
+    """
+    pieces = np.stack([np.asarray(bitboard, dtype=np.uint64)
+                       for bitboard in (pawns, knights, bishops, rooks, queens, kings)], axis=-1)
+    occupied = np.stack([np.asarray(occupied_white, dtype=np.uint64), np.asarray(occupied_black, dtype=np.uint64)])
+
+    return np.concatenate([pieces & occupied[0][:, None], pieces & occupied[1][:, None]], axis=-1)
+
+
+def boards_to_bitboards(boards):
+    """Returns the (N, 12) plane bitboards of a list of chess.Boards."""
+    fields = [np.fromiter((getattr(board, name) for board in boards), dtype=np.uint64, count=len(boards))
+              for name in ("pawns", "knights", "bishops", "rooks", "queens", "kings")]
+    white = np.fromiter((board.occupied_co[chess.WHITE] for board in boards), dtype=np.uint64, count=len(boards))
+    black = np.fromiter((board.occupied_co[chess.BLACK] for board in boards), dtype=np.uint64, count=len(boards))
+
+    return piece_bitboards(white, black, *fields)
+
+
+def unpack_bitboards(bitboards):
+    """
+    Unpacks plane bitboards into a position tensor.
+    :param bitboards: (N, 12) uint64 array
+    :return: (N, 12, 64) uint8 array, 1 where the plane's piece stands on the square
+    """
+    as_bytes = np.ascontiguousarray(bitboards, dtype='<u8').view(np.uint8).reshape(len(bitboards), 12, 8)
+    return np.unpackbits(as_bytes, axis=-1, bitorder='little')
+
+
+def evaluate_bitboards(bitboards):
+    """
+    Material plus piece map score of many positions, computed like evaluate_position but without the game-over checks.
+    :param bitboards: (N, 12) uint64 array, ordered as PLANES
+    :return: (N,) float64 array, positive is good for white
+    """
+    tensor = unpack_bitboards(bitboards)
+    return tensor.reshape(len(tensor), 12 * 64) @ WEIGHTS.reshape(12 * 64)
+
+
+def evaluate_positions(boards):
+    """Scores a list of chess.Boards in one call. See evaluate_bitboards."""
+    if not boards:
+        return np.zeros(0)
+
+    return evaluate_bitboards(boards_to_bitboards(boards))
@@ -4,34 +4,101 @@ import utils
 constants = utils.load_constants()
 
 
+def build_piece_square_values():
+    """
+    Combines piece values and piece maps into one signed table per color, indexed [color][piece_type][square].
+    Positive is good for white. Kings have no material value.
+    """
+    tables = {chess.WHITE: [[0] * 64], chess.BLACK: [[0] * 64]}
+
+    for piece_type in chess.PIECE_TYPES:
+        value = constants.piece_values[piece_type] if piece_type != chess.KING else 0
+
+        tables[chess.WHITE].append([value + bonus for bonus in constants.piece_square_maps[chess.WHITE][piece_type]])
+        tables[chess.BLACK].append([-value - bonus for bonus in constants.piece_square_maps[chess.BLACK][piece_type]])
+
+    return tables
+
+
+PIECE_SQUARE_VALUES = build_piece_square_values()
+
+
+def static_score(board):
+    """Material plus piece map score of a position, computed from scratch."""
+    score = 0
+
+    for square, piece in board.piece_map().items():
+        score += PIECE_SQUARE_VALUES[piece.color][piece.piece_type][square]
+
+    return score
+
+
+class EvaluationState:
+    def __init__(self, board):
+        """
+        Keeps the material and piece map score of the board the search is on, updated from each move instead of
+        rescanning the board. Call push() before board.push(move) and pop() after board.pop().
+        :param board: The position the search starts from
+        """
+        self.score = static_score(board)
+        self.stack = []
+
+    def push(self, board, move):
+        """
+        Updates the score for a move that is about to be played.
+        :param board: The board, before the move is pushed
+        :param move: chess.Move
+        """
+        self.stack.append(self.score)
+
+        if not move:
+            # Null move
+            return
+
+        turn = board.turn
+        own = PIECE_SQUARE_VALUES[turn]
+        their = PIECE_SQUARE_VALUES[not turn]
+        from_square = move.from_square
+        to_square = move.to_square
+        piece_type = board.piece_type_at(from_square)
+
+        if move.promotion:
+            delta = own[move.promotion][to_square] - own[chess.PAWN][from_square]
+        else:
+            delta = own[piece_type][to_square] - own[piece_type][from_square]
+
+        if board.occupied_co[not turn] & chess.BB_SQUARES[to_square]:
+            delta -= their[board.piece_type_at(to_square)][to_square]
+        elif piece_type == chess.PAWN and to_square == board.ep_square:
+            # En passant, the captured pawn is behind the target square
+            captured_square = to_square - 8 if turn == chess.WHITE else to_square + 8
+            delta -= their[chess.PAWN][captured_square]
+        elif piece_type == chess.KING and abs(to_square - from_square) == 2:
+            # Castling, move the rook as well
+            if to_square > from_square:
+                delta += own[chess.ROOK][to_square - 1] - own[chess.ROOK][to_square + 1]
+            else:
+                delta += own[chess.ROOK][to_square + 1] - own[chess.ROOK][to_square - 2]
+
+        self.score += delta
+
+    def pop(self):
+        self.score = self.stack.pop()
+
+
 def evaluate_position(board):
-    """Evaluates the current material of a singular position."""
+    """
+    Evaluates the current material of a singular position. The search keeps an EvaluationState instead, whose score
+    is the same without the game-over checks.
+    :param board: chess.Board
+    """
     # If the game has ended, figure out who is winning
     if board.is_checkmate():
-        return float('inf' if board.turn else '-inf')
+        # The side to move is mated
+        return float('-inf' if board.turn else 'inf')
     elif board.is_stalemate() or board.is_insufficient_material() or board.is_seventyfive_moves() or board.is_fivefold_repetition():
         return 0
     else:
-        # Evaluate material (positive is good for white, negative good for black)
-        material_balance = utils.material_balance(board)
-
-        piece_maps = constants["piece_maps"]
-        piece_map_score = 0
-
-        # Give a bonus for pieces aligning with the piece map
-        for square in chess.SQUARES:
-            if board.piece_at(square):
-                piece = board.piece_at(square)
-                if piece.color == chess.WHITE:
-                    piece_map_score += piece_maps[str(piece.piece_type)][63 - square]
-                else:
-                    piece_map_score -= piece_maps[str(piece.piece_type)][square]
-
-        # Penalize for repeating moves
-        repeat_score = 0
-
-        if len(board.move_stack) >= 3:
-            if board.move_stack[-3] == board.move_stack[-1]:
-                repeat_score += constants["repeat_score"]
-
-        return material_balance + piece_map_score
+        # Material (positive is good for white, negative good for black) plus a bonus for pieces aligning with the
+        # piece map
+        return static_score(board)
@@ -1,10 +1,8 @@
-import copy
 import time
 import chess
 import chess.pgn
 import utils
-from minimax import find_move
-import cProfile
+from ponder import PonderWorker
 import multiprocessing
 import datetime
 
@@ -44,11 +42,18 @@ if __name__ == '__main__':
     # On Windows calling this function is necessary.
     multiprocessing.freeze_support()
 
-    board = chess.Board(fen=utils.load_constants()["starting_fen"])
+    if "--startup-profile" in sys.argv:
+        utils.startup_profile("minimax")
+        sys.exit()
+
+    board = chess.Board(fen=utils.load_constants().starting_fen)
 
     white = input("Color (W/b) ") == "W"
     inverse = input("Inverse board? (Y/n) ") == "Y"
 
+    # Does all the searching, and ponders while the user thinks
+    ponder_worker = PonderWorker(Process)
+
 
 def print_board(board, is_white):
     if is_white or (not is_white and inverse):
@@ -62,15 +67,8 @@ def print_board(board, is_white):
 def find_and_make_move(board, maximizing=True, allow_book=True):
     start_time = time.time()
 
-    profiler = cProfile.Profile()
-    profiler.enable()
-
-    eval = find_move(board, utils.load_constants()["max_depth"], utils.load_constants()["time_limit"],
-                     allow_book=allow_book,
-                     engine_is_maximizing=maximizing)
-
-    profiler.disable()
-    profiler.dump_stats("profile.stats")
+    constants = utils.load_constants()
+    eval = ponder_worker.search(board, constants.max_depth, constants.time_limit, allow_book=allow_book)
 
     time_spent = round(time.time() - start_time, 2)
 
@@ -102,6 +100,7 @@ def end_game(board):
     print(board.fen())
 
     utils.save_game(board)
+    ponder_worker.quit()
 
 
 if __name__ == '__main__':
@@ -109,18 +108,14 @@ if __name__ == '__main__':
         if white:
             try:
                 # Start pondering
-                p = Process(target=find_move, args=(copy.deepcopy(board), 64, 32000),
-                            kwargs={"allow_book": False, "engine_is_maximizing": white,
-                                    "print_updates": False})
-                p.start()
+                ponder_worker.ponder(board)
                 san_move = input("Move: ")
-                p.terminate()
-                p.join()
 
             except KeyboardInterrupt:
                 print(utils.generate_pgn(board))
                 print(board.fen())
                 utils.save_game(board)
+                ponder_worker.quit()
                 break
 
             try:
@@ -153,21 +148,15 @@ if __name__ == '__main__':
 
             while True:
                 try:
-                    p = Process(target=find_move, args=(copy.deepcopy(board), 64,
-                                                        32000),
-                                kwargs={"allow_book": False, "engine_is_maximizing": white,
-                                        "print_updates": False, "score_only": True})
-                    p.start()
-
+                    # Start pondering
+                    ponder_worker.ponder(board)
                     san_move = input("Move: ")
 
-                    p.terminate()
-                    p.join()
-
                 except KeyboardInterrupt:
                     print(utils.generate_pgn(board))
                     print(board.fen())
                     utils.save_game(board)
+                    ponder_worker.quit()
                     break
 
                 try:
@@ -0,0 +1,346 @@
+import argparse
+import datetime
+import math
+import multiprocessing
+import multiprocessing.util
+import os
+import random
+import sys
+import time
+
+import chess
+import chess.engine
+import chess.pgn
+
+import utils
+
+constants = utils.load_constants()
+
+DEFAULT_OPENING_PLIES = 8
+DEFAULT_MAX_PLIES = 400  # Games still going after this many plies are adjudicated a draw
+RESULTS = ("1-0", "0-1", "1/2-1/2")
+
+
+class PGNWriter:
+    def __init__(self, filepath):
+        """
+        Appends games to a PGN file as they finish, flushing after each one, instead of writing a whole game list at
+        the end like utils.save_game. An interrupted match keeps every game played so far.
+        """
+        self.file = open(filepath, 'a', encoding="utf-8")
+
+    def write(self, pgn):
+        """:param pgn: One game as PGN text"""
+        self.file.write(pgn.strip() + "\n\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def sample_openings(count, plies, seed=None, filepath=constants.games_filepath):
+    """
+    Picks random games from a move list file like games.txt and cuts them after plies moves.
+    :return: list of count openings, each a list of UCI moves
+    """
+    with open(filepath, 'r') as f:
+        lines = [line.split() for line in f if line.strip()]
+
+    rng = random.Random(seed)
+    openings = []
+
+    # Without repeats unless there are more openings wanted than games
+    chosen = rng.sample(lines, count) if count <= len(lines) else rng.choices(lines, k=count)
+
+    for line in chosen:
+        board = chess.Board()
+
+        for san in line[:plies]:
+            if san in RESULTS or san == "*":
+                break
+
+            board.push_san(san)
+
+        openings.append([move.uci() for move in board.move_stack])
+
+    return openings
+
+
+def expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_difference(score):
+    """Elo difference that gives an expected score, infinite at 0 and 1."""
+    if score <= 0:
+        return float('-inf')
+    if score >= 1:
+        return float('inf')
+
+    return -400 * math.log10(1 / score - 1)
+
+
+def match_statistics(wins, draws, losses, elo0=0, elo1=5, alpha=0.05, beta=0.05):
+    """
+    Elo with a 95% interval, and a sequential probability ratio test of H0: elo = elo0 against H1: elo = elo1, using the
+    normal approximation of the game results' log-likelihood ratio.
+    :param alpha: Probability of accepting H1 when H0 holds
+    :param beta: Probability of accepting H0 when H1 holds
+    :return: dict with elo, elo_error (half the 95% interval), llr, the llr bounds and the decision ("H0", "H1" or
+             None while undecided)
+    """
+    games = wins + draws + losses
+    lower_bound = math.log(beta / (1 - alpha))
+    upper_bound = math.log((1 - beta) / alpha)
+
+    if games == 0:
+        return {"elo": 0, "elo_error": float('inf'), "llr": 0, "bounds": (lower_bound, upper_bound), "decision": None}
+
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    error = 1.96 * math.sqrt(variance / games)
+
+    elo = elo_difference(score)
+    elo_error = (elo_difference(score + error) - elo_difference(score - error)) / 2
+
+    if variance > 0:
+        score0 = expected_score(elo0)
+        score1 = expected_score(elo1)
+        llr = (score1 - score0) * (2 * score - score0 - score1) * games / (2 * variance)
+    else:
+        llr = 0
+
+    decision = "H1" if llr >= upper_bound else "H0" if llr <= lower_bound else None
+
+    return {"elo": elo, "elo_error": elo_error, "llr": llr, "bounds": (lower_bound, upper_bound), "decision": decision}
+
+
+def open_engine(directory, constants_filepath=None, hash_size_mb=None):
+    """
+    Starts an engine's uci.py in its own process, from directory, so each side can be a different code version. Each
+    side searches with find_move, single-threaded and without its opening book.
+    :param constants_filepath: constants.json variant to load instead of the directory's own
+    """
+    env = dict(os.environ)
+
+    if constants_filepath is not None:
+        env["TECHFISH_CONSTANTS"] = os.path.abspath(constants_filepath)
+
+    engine = chess.engine.SimpleEngine.popen_uci([sys.executable, "uci.py"], cwd=directory, env=env)
+
+    options = {"OwnBook": False, "Threads": 1}
+
+    if hash_size_mb is not None:
+        options["Hash"] = hash_size_mb
+
+    engine.configure({name: value for name, value in options.items() if name in engine.options})
+
+    return engine
+
+
+def init_worker(engine_specs, hash_size_mb):
+    """Starts both engines once per worker; they play every game the worker is given."""
+    global engines
+
+    engines = [open_engine(directory, constants_filepath, hash_size_mb) for directory, constants_filepath in
+               engine_specs]
+
+    for engine in engines:
+        multiprocessing.util.Finalize(engine, engine.quit, exitpriority=10)
+
+
+def play_game(task):
+    """
+    Plays one game in a worker.
+    :param task: (round, opening moves, index of the engine playing white, names, limits, max plies)
+    :return: (round, result from the first engine's perspective as 1, 0.5 or 0, PGN text)
+    """
+    round_number, opening, white, names, limits, max_plies = task
+
+    board = chess.Board()
+    for move in opening:
+        board.push_uci(move)
+
+    clocks = {chess.WHITE: limits.get("clock"), chess.BLACK: limits.get("clock")}
+    termination = None
+    result = None
+
+    while board.outcome(claim_draw=True) is None and len(board.move_stack) < max_plies:
+        side = white if board.turn == chess.WHITE else 1 - white
+        limit = chess.engine.Limit(time=limits.get("movetime"), nodes=limits.get("nodes"), depth=limits.get("depth"))
+
+        if clocks[chess.WHITE] is not None:
+            limit.white_clock, limit.black_clock = clocks[chess.WHITE], clocks[chess.BLACK]
+            limit.white_inc = limit.black_inc = limits.get("increment", 0)
+
+        start_time = time.monotonic()
+
+        try:
+            move = engines[side].play(board, limit, game=round_number).move
+        except chess.engine.EngineError as e:
+            termination = f"{names[side]} failed: {e}"
+            result = "0-1" if board.turn == chess.WHITE else "1-0"
+            break
+
+        if clocks[board.turn] is not None:
+            clocks[board.turn] -= time.monotonic() - start_time
+
+            if clocks[board.turn] < 0:
+                termination = "time forfeit"
+                result = "0-1" if board.turn == chess.WHITE else "1-0"
+                break
+
+            clocks[board.turn] += limits.get("increment", 0)
+
+        if move is None or not board.is_legal(move):
+            termination = f"{names[side]} played an illegal move"
+            result = "0-1" if board.turn == chess.WHITE else "1-0"
+            break
+
+        board.push(move)
+
+    if result is None:
+        outcome = board.outcome(claim_draw=True)
+
+        if outcome is not None:
+            result = outcome.result()
+            termination = outcome.termination.name.lower().replace("_", " ")
+        else:
+            result = "1/2-1/2"
+            termination = "adjudicated after max plies"
+
+    game = chess.pgn.Game.from_board(board)
+    game.headers["Event"] = "TechFish match"
+    game.headers["Date"] = datetime.date.today().strftime("%Y.%m.%d")
+    game.headers["Round"] = str(round_number)
+    game.headers["White"] = names[white]
+    game.headers["Black"] = names[1 - white]
+    game.headers["Result"] = result
+    game.headers["Termination"] = termination
+    game.headers["PlyCount"] = str(len(board.move_stack))
+    game.headers["Opening"] = " ".join(opening)
+
+    white_score = {"1-0": 1, "0-1": 0, "1/2-1/2": 0.5}[result]
+
+    return round_number, white_score if white == 0 else 1 - white_score, str(game)
+
+
+def run_match(engine_specs, names, games, pgn_filepath, *, limits, concurrency=None, opening_plies=DEFAULT_OPENING_PLIES,
+              max_plies=DEFAULT_MAX_PLIES, seed=None, sprt=None, hash_size_mb=None, print_progress=True):
+    """
+    Plays games between two engines in a pool of worker processes. Each opening is played twice, with the engines
+    swapping colors, so neither is favored by the openings drawn.
+    :param engine_specs: (directory, constants file or None) of both engines
+    :param games: Number of games, rounded up to an even number
+    :param limits: dict with any of movetime, nodes, depth (per move) and clock, increment (seconds per side)
+    :param sprt: dict with elo0, elo1, alpha and beta to stop once the test decides, or None to play every game
+    :return: (wins, draws, losses) of the first engine, and the statistics of match_statistics
+    """
+    pairs = (games + 1) // 2
+    openings = sample_openings(pairs, opening_plies, seed)
+    tasks = [(2 * i + swap + 1, opening, swap, names, limits, max_plies)
+             for i, opening in enumerate(openings) for swap in (0, 1)]
+
+    wins = draws = losses = 0
+    statistics = match_statistics(0, 0, 0, **(sprt or {}))
+
+    with multiprocessing.Pool(concurrency or os.cpu_count(), initializer=init_worker,
+                              initargs=(engine_specs, hash_size_mb)) as pool, PGNWriter(pgn_filepath) as writer:
+        for round_number, score, pgn in pool.imap_unordered(play_game, tasks):
+            writer.write(pgn)
+
+            if score == 1:
+                wins += 1
+            elif score == 0:
+                losses += 1
+            else:
+                draws += 1
+
+            statistics = match_statistics(wins, draws, losses, **(sprt or {}))
+
+            if print_progress:
+                print(f"Game {round_number}: {names[0]} {score} | +{wins} ={draws} -{losses} | "
+                      f"Elo {statistics['elo']:.1f} +- {statistics['elo_error']:.1f}"
+                      + (f" | LLR {statistics['llr']:.2f} {statistics['bounds'][0]:.2f}..{statistics['bounds'][1]:.2f}"
+                         if sprt else ""))
+
+            if sprt and statistics["decision"]:
+                pool.terminate()
+                break
+
+    return (wins, draws, losses), statistics
+
+
+def parse_time_control(text):
+    """:return: (seconds, increment) of a time control written as base+increment in seconds, e.g. 10+0.1"""
+    base, _, increment = text.partition("+")
+    return float(base), float(increment or 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays engine-vs-engine games between two TechFish configurations "
+                                                 "and reports the Elo difference.")
+    parser.add_argument("--engine1", default=".", help="Directory of the first engine's code")
+    parser.add_argument("--constants1", help="constants.json variant for the first engine")
+    parser.add_argument("--engine2", default=".", help="Directory of the second engine's code")
+    parser.add_argument("--constants2", help="constants.json variant for the second engine")
+    parser.add_argument("--games", type=int, default=100, help="Games to play, in pairs with colors swapped")
+    parser.add_argument("--concurrency", type=int, help="Games played at once, defaults to the number of CPUs")
+    parser.add_argument("--pgn", default="match.pgn", help="PGN file the games are appended to")
+    parser.add_argument("--movetime", type=float, help="Seconds per move")
+    parser.add_argument("--nodes", type=int, help="Nodes per move")
+    parser.add_argument("--depth", type=int, help="Depth per move")
+    parser.add_argument("--tc", help="Clock per side as seconds+increment, e.g. 10+0.1")
+    parser.add_argument("--hash", type=int, help="Transposition table size of each engine, in MB")
+    parser.add_argument("--opening-plies", type=int, default=DEFAULT_OPENING_PLIES,
+                        help="Plies of each games.txt game used as an opening")
+    parser.add_argument("--max-plies", type=int, default=DEFAULT_MAX_PLIES,
+                        help="Plies after which a game is adjudicated a draw")
+    parser.add_argument("--seed", type=int, help="Seed for the opening sample")
+    parser.add_argument("--sprt", nargs=2, type=float, metavar=("ELO0", "ELO1"),
+                        help="Stop once a SPRT decides between these Elo differences")
+    parser.add_argument("--alpha", type=float, default=0.05, help="SPRT false positive rate")
+    parser.add_argument("--beta", type=float, default=0.05, help="SPRT false negative rate")
+    args = parser.parse_args()
+
+    limits = {"movetime": args.movetime, "nodes": args.nodes, "depth": args.depth}
+
+    if args.tc:
+        limits["clock"], limits["increment"] = parse_time_control(args.tc)
+
+    if not any(limits.values()):
+        parser.error("give at least one of --movetime, --nodes, --depth or --tc")
+
+    engine_specs = [(args.engine1, args.constants1), (args.engine2, args.constants2)]
+    names = [os.path.basename(os.path.abspath(directory)) + (f" ({os.path.basename(constants_filepath)})"
+                                                              if constants_filepath else "")
+             for directory, constants_filepath in engine_specs]
+
+    if names[0] == names[1]:
+        names = [f"{names[0]} #1", f"{names[1]} #2"]
+
+    sprt = {"elo0": args.sprt[0], "elo1": args.sprt[1], "alpha": args.alpha, "beta": args.beta} if args.sprt else None
+
+    (wins, draws, losses), statistics = run_match(engine_specs, names, args.games, args.pgn, limits=limits,
+                                                  concurrency=args.concurrency, opening_plies=args.opening_plies,
+                                                  max_plies=args.max_plies, seed=args.seed, sprt=sprt,
+                                                  hash_size_mb=args.hash)
+
+    print()
+    print(f"{names[0]} vs. {names[1]}: +{wins} ={draws} -{losses}")
+    print(f"Elo: {statistics['elo']:.1f} +- {statistics['elo_error']:.1f} (95%)")
+
+    if sprt:
+        print(f"SPRT [{sprt['elo0']}, {sprt['elo1']}]: LLR {statistics['llr']:.2f} "
+              f"({statistics['bounds'][0]:.2f}, {statistics['bounds'][1]:.2f}), "
+              + {"H1": "H1 accepted", "H0": "H0 accepted", None: "inconclusive"}[statistics["decision"]])
+
+
+if __name__ == '__main__':
+    main()
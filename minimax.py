@@ -1,7 +1,5 @@
-import random
-import time
-import re
-import threading
+import atexit
+import os
 import copy
 
 import chess
@@ -9,35 +7,98 @@ import chess
 import utils
 from errors import *
 from transposition_table import TranspositionTable
-from evaluate_position import evaluate_position
+import opening_book
+from evaluate_position import EvaluationState
 from quiescence_search import quiescence_search
+from time_manager import TimeManager
+from search_stats import SearchStats
+from search_heuristics import SearchHeuristics
+from node_context import NodeContext
 
 constants = utils.load_constants()
-transposition_table = TranspositionTable()
 
-zobrist_hash = utils.ZobristHash(chess.Board(constants["starting_fen"]))
+if constants.persist_transpositions:
+    # Warm start from the table saved by previous runs
+    transposition_table = TranspositionTable.open(constants.transpositions_filepath, utils.ZobristHash.key_digest)
+else:
+    transposition_table = TranspositionTable()
 
-abort_flag = threading.Event()
+current_time_manager = TimeManager()  # Counts nodes and decides when the current search is aborted
+root_best = None  # (move, score) of the best root move so far in the current iteration
+stats = None  # SearchStats of the current search, None unless find_move was asked to collect them
+num_helper_threads = constants.num_helper_threads  # Lazy SMP helpers, can be changed by UCI's Threads option
 
-killer_moves = {
-    chess.WHITE: [[] for _ in range(30)],
-    chess.BLACK: [[] for _ in range(30)]
-}
+heuristics = SearchHeuristics()  # Killer, history and countermove tables for move ordering
 
+NULL_WINDOW = 1 / 1000  # Width of a null window, the transposition table's score resolution
 
-def minimax(board, depth, alpha, beta, is_maximizing, hash=zobrist_hash, first_move=None, allow_null=True, root=None):
+
+def minimax(board, depth, alpha, beta, hash=None, first_move=None, allow_null=True, root=None, evaluator=None, ply=0):
     """
-    A minimax evaluation function, which uses alpha-beta pruning, move ordering, and Zobrist hashing. Also uses Lazy SMP.
-    :param allow_null: Allow null pruning?
-    :param first_move: The current best move from the previous iterative deepening search, will be evaluated first
-    :param hash:
+    Searches a position with alpha-beta pruning. Scores and bounds are from white's perspective (positive is good for
+    white), whichever side is to move; the search itself is a negamax principal variation search, see negamax.
     :param board:
     :param depth:
     :param alpha:
     :param beta:
-    :param is_maximizing:
-    :return:
+    :param hash: ZobristHash kept in step with board, created if not given
+    :param first_move: The current best move from the previous iterative deepening search, will be evaluated first
+    :param allow_null: Allow null pruning?
+    :param root: The position the search started from
+    :param evaluator: EvaluationState kept in step with board, created if not given
+    :param ply: Distance from the root
+    :return: dict with the score and the best move
     """
+    global root_best
+
+    if hash is None:
+        hash = utils.ZobristHash(board)
+
+    if evaluator is None:
+        evaluator = EvaluationState(board)
+
+    if ply == 0:
+        root_best = None
+
+    # negamax scores from the side to move
+    if board.turn == chess.WHITE:
+        score = negamax(board, depth, alpha, beta, hash, first_move, allow_null, root, evaluator, ply)
+    else:
+        score = -negamax(board, depth, -beta, -alpha, hash, first_move, allow_null, root, evaluator, ply)
+
+    if ply == 0 and root_best is not None:
+        best_move = root_best[0]
+    else:
+        entry = transposition_table.probe(hash.current_hash)
+        best_move = entry["best_move"] if entry is not None else None
+
+    return {
+        "score": score,
+        "best_move": best_move,
+        "depth": depth
+    }
+
+
+def negamax(board, depth, alpha, beta, hash, first_move=None, allow_null=True, root=None, evaluator=None, ply=0):
+    """
+    Principal variation search. The first move is searched with the full window, the rest with a null window that only
+    proves they are no better; a move that beats alpha anyway is searched again with the full window. Uses the
+    transposition table, staged move ordering, futility pruning, late move reductions and extensions.
+    :param alpha: Lower bound, from the side to move's perspective
+    :param beta: Upper bound, from the side to move's perspective
+    :return: Score from the side to move's perspective (positive is good for the side to move)
+    """
+    global root_best
+
+    if depth <= 0:
+        # Quiescence search counts and hashes the node itself
+        return quiescence_search(board, alpha, beta, evaluator=evaluator, time_manager=current_time_manager,
+                                 stats=stats, hash=hash, transposition_table=transposition_table)
+
+    current_time_manager.count_node()
+
+    if ply > 0 and hash.is_repetition(board.halfmove_clock):
+        return 0
 
     initial_alpha = alpha
     initial_beta = beta
@@ -45,187 +106,259 @@ def minimax(board, depth, alpha, beta, is_maximizing, hash=zobrist_hash, first_m
     hash_key = hash.current_hash
 
     # Check if there is an entry in the transposition table for this hash
-    if transposition_table.entry_exists(hash_key):
-        entry = transposition_table.get_entry(hash_key)
-        if entry["depth"] >= depth:
-            if entry["type"] == 'exact':
-                return entry
-            elif entry["type"] == "upperbound" and entry["score"] <= alpha:
-                return entry
-            elif entry["type"] == "lowerbound" and entry["score"] >= beta:
-                return entry
+    entry = transposition_table.probe(hash_key)
+    if entry is not None:
+        if ply > 0 and entry["depth"] >= depth and (entry["type"] == "exact"
+                                                    or entry["type"] == "upperbound" and entry["score"] <= alpha
+                                                    or entry["type"] == "lowerbound" and entry["score"] >= beta):
+            if stats is not None:
+                stats.tt_cutoffs[entry["type"]] += 1
+
+            return entry["score"]
 
         # Node needs to be examined, we can make it more efficient
         if not first_move:
             first_move = entry["best_move"]
 
-    # If we reached the bottom of the tree, or if position is quiet, start quiescent search
-    if depth == 0 or board.is_game_over():
-        if not utils.is_quiescent(board):
-            score = quiescence_search(board, alpha, beta)
-        else:
-            score = evaluate_position(board)
-
-        type = utils.node_type(score, initial_alpha, initial_beta)
-
-        transposition_table.add_entry(hash_key, {
-            "score": score,
-            "best_move": None,
-            "depth": depth,
-            "type": type
-        })
-
-        return {
-            "score": evaluate_position(board),
-            "best_move": chess.Move.null(),
-            "depth": depth
-        }
-
-    # Futility pruning
-    if depth == 1:
-        if not evaluate_position(board) + constants["piece_values"]["2"] > alpha and not board.is_check() \
-                and not utils.is_generator_empty(board.legal_moves):
-            # Unlikely to raise alpha, search captures and checks
-            moves = [move for move in board.legal_moves if board.is_capture(move) or board.gives_check(move)]
-
-        elif utils.is_generator_empty(board.legal_moves):
-            return {
-                "score": alpha,
-                "best_move": None,
-                "depth": depth
-            }
-        else:
-            moves = board.legal_moves
-    elif depth == 2:
-        if not evaluate_position(board) + constants["piece_values"]["4"] > alpha and not board.is_check() \
-                and not utils.is_generator_empty(board.legal_moves):
-            # Unlikely to raise alpha, search captures and checks
-            moves = [move for move in board.legal_moves if board.is_capture(move) or board.gives_check(move)]
-
-        elif utils.is_generator_empty(board.legal_moves):
-            return {
-                "score": alpha,
-                "best_move": None,
-                "depth": depth
-            }
+    sign = 1 if board.turn == chess.WHITE else -1
+    context = NodeContext(board)
+
+    if context.is_game_over:
+        score = context.evaluate(evaluator)
+
+        transposition_table.store(hash_key, score, None, depth, "exact")
+
+        return score
+
+    in_check = context.in_check
+    static_eval = context.evaluate(evaluator) if not in_check else None
+
+    # Null move pruning: if passing still beats beta, a real move almost certainly does too. Not after another null
+    # move, not in check, where passing is illegal, and not with only pawns, where zugzwang makes passing the best move.
+    if allow_null and ply > 0 and depth >= 2 and not in_check and beta != float('inf') and static_eval >= beta \
+            and board.occupied_co[board.turn] & ~(board.pawns | board.kings):
+        reduction = constants.R + depth // constants.null_move_depth_divisor
+        null_move = chess.Move.null()
+
+        hash.move(null_move, board)
+        evaluator.push(board, null_move)
+        board.push(null_move)
+
+        score = -negamax(board, depth - 1 - reduction, -beta, -beta + NULL_WINDOW, hash, allow_null=False, root=root,
+                         evaluator=evaluator, ply=ply + 1)
+
+        board.pop()
+        evaluator.pop()
+        hash.pop(null_move, board)
+
+        if score >= beta:
+            if score == float('inf'):
+                # A mate found after passing is not proven, the side to move may not have to allow it
+                score = beta
+
+            if depth >= constants.null_move_verification_depth:
+                # Deep cutoffs are confirmed by a reduced search of the real moves, which catches zugzwang
+                if stats is not None:
+                    stats.null_move_verifications += 1
+
+                score = negamax(board, depth - reduction, beta - NULL_WINDOW, beta, hash, allow_null=False, root=root,
+                                evaluator=evaluator, ply=ply)
+
+            if score >= beta:
+                if stats is not None:
+                    stats.null_move_cutoffs += 1
+
+                return score
+
+    # Futility pruning: far below alpha, only captures and checks can raise it
+    moves = context.legal_moves
+    best_score = float('-inf')
+    best_move = None
+
+    if depth <= 2 and not in_check:
+        margin = constants.piece_values[chess.KNIGHT] if depth == 1 else constants.piece_values[chess.ROOK]
+        futility_score = static_eval + margin
+
+        if futility_score <= alpha:
+            moves = [move for move in context.legal_moves if board.is_capture(move) or board.gives_check(move)]
+
+            # The pruned moves are assumed to score at most futility_score
+            best_score = futility_score
+
+            if stats is not None:
+                stats.futility_pruned += len(context.legal_moves) - len(moves)
+
+    ordered_moves = utils.MovePicker(board, moves, first_move, heuristics.killer_moves(ply),
+                                     heuristics.countermove(board), heuristics.history)
+    quiets_searched = []  # Quiet moves that didn't cause a cutoff, their history is lowered when another move does
+
+    for i, move in enumerate(ordered_moves):
+        ext = utils.extension(board, move, root, utils.node_type(best_score, initial_alpha, initial_beta))
+
+        if ext and stats is not None:
+            stats.extensions += 1
+
+        quiet = not board.is_capture(move)
+        reduce = i > constants.lmr_sample - 1 and quiet and not board.gives_check(move) \
+            and depth - 1 - constants.lmr_reduction > 0
+
+        hash.move(move, board)  # Make sure the Zobrist Hash calculation happens before the move
+        evaluator.push(board, move)
+        board.push(move)  # Try the move
+
+        new_depth = depth + ext - 1
+
+        if i == 0:
+            score = -negamax(board, new_depth, -beta, -alpha, hash, root=root, evaluator=evaluator, ply=ply + 1)
         else:
-            moves = board.legal_moves
+            if reduce:
+                # Late move reduction, with a null window
+                if stats is not None:
+                    stats.lmr_reductions += 1
 
-    else:
-        moves = board.legal_moves
+                score = -negamax(board, new_depth - constants.lmr_reduction, -alpha - NULL_WINDOW, -alpha, hash,
+                                 root=root, evaluator=evaluator, ply=ply + 1)
 
-    ordered_moves = utils.order_moves(board, moves, transposition_table, hash, depth, killer_moves, first_move)
+                if score > alpha and stats is not None:
+                    stats.lmr_researches += 1
 
-    if is_maximizing:
-        # Find best move for the maximizing player (white)
-        max_score = float('-inf')  # Currently, the best score that can be achieved
-        best_move = None  # The best move
+            if not reduce or score > alpha:
+                # Scout with a null window
+                score = -negamax(board, new_depth, -alpha - NULL_WINDOW, -alpha, hash, root=root, evaluator=evaluator,
+                                 ply=ply + 1)
 
-        for i, move in enumerate(ordered_moves):
-            ext = utils.extension(board, move, root, utils.node_type(max_score, initial_alpha, initial_beta))
-            hash.move(move, board)  # Make sure the Zobrist Hash calculation happens before the move
-            board.push(move)  # Try the move
+            if alpha < score < beta:
+                # The scout failed high inside the window, search again for the exact score
+                score = -negamax(board, new_depth, -beta, -alpha, hash, root=root, evaluator=evaluator, ply=ply + 1)
 
-            if i > constants["lmr_sample"] - 1 and not board.is_capture(move) and not board.gives_check(move) and \
-                    not board.is_check() and depth - 1 - constants["lmr_reduction"] > 0:
-                search = minimax(board, depth + ext - 1 - constants["lmr_reduction"], alpha, beta, not is_maximizing, hash, root=root)
-            else:
-                search = minimax(board, depth + ext - 1, alpha, beta, not is_maximizing, hash, root=root)
+        board.pop()
+        evaluator.pop()
+        hash.pop(move, board)
 
-            board.pop()
-            zobrist_hash.pop(move, board)
+        if ply == 0 and score > alpha:
+            # Only moves inside the window are trusted, a fail low of an aspiration window proves no move
+            root_best = (move, score * sign)
 
-            score = search["score"]
+        if score > best_score or best_move is None:
+            best_score = score
+            best_move = move
 
-            if score > max_score:
-                max_score = score
-                best_move = move
+        alpha = max(alpha, best_score)
 
-            alpha = max(alpha, max_score)
+        # fail high (beta cutoff)
+        if alpha >= beta:
+            if stats is not None:
+                stats.beta_cutoffs += 1
+                stats.first_move_cutoffs += i == 0
 
-            if score > alpha:
-                killer_moves[board.turn][depth].append(move)
+            if quiet:
+                heuristics.update(board, move, ply, depth, quiets_searched)
 
-            # fail high (beta cutoff)
-            if alpha >= beta:
-                break
+            break
 
-        type = utils.node_type(max_score, initial_alpha, initial_beta)
+        if quiet:
+            quiets_searched.append(move)
 
-        transposition_table.add_entry(hash_key, {
-            'score': max_score,
-            'best_move': best_move,
-            'depth': depth,
-            "type": type
-        })
+    type = utils.node_type(best_score, initial_alpha, initial_beta)
 
-        utils.kill_helpers(abort_flag)
+    transposition_table.store(hash_key, best_score, best_move, depth, type)
 
-        return {
-            'score': max_score,
-            'best_move': best_move,
-            'depth': depth
-        }
+    return best_score
 
-    else:
-        # Find best move for minimizing player (black)
-        min_score = float('inf')
-        best_move = None
 
-        for i, move in enumerate(ordered_moves):
-            ext = utils.extension(board, move, root, utils.node_type(min_score, initial_alpha, initial_beta))
-            hash.move(move, board)  # Make sure the Zobrist Hash calculation happens before the move
-            board.push(move)
+def aspiration_search(board, depth, previous_score):
+    """
+    Searches the root with a narrow window around the previous iteration's score, which cuts more of the tree. The
+    window is widened on the failing side until the score falls inside it.
+    :param previous_score: Score of the previous iteration, from white's perspective, or None to use the full window
+    :return: The result of minimax
+    """
+    if previous_score is None or abs(previous_score) == float('inf'):
+        return minimax(board, depth, float('-inf'), float('inf'), hash=utils.ZobristHash(board), root=board)
 
-            if i > constants["lmr_sample"] - 1 and not board.is_capture(move) and not board.gives_check(move) and \
-                    not board.is_check() and depth - 1 - constants["lmr_reduction"] > 0:
-                search = minimax(board, depth + ext - 1 - constants["lmr_reduction"], alpha, beta, not is_maximizing, hash, root=root)
-            else:
-                search = minimax(board, depth + ext - 1, alpha, beta, not is_maximizing, hash, root=root)
+    delta = constants.aspiration_window
+    alpha = previous_score - delta
+    beta = previous_score + delta
 
-            board.pop()
-            zobrist_hash.pop(move, board)
+    while True:
+        search = minimax(board, depth, alpha, beta, hash=utils.ZobristHash(board), root=board)
 
-            score = search["score"]
+        score = search["score"]
 
-            if score < min_score:
-                min_score = score
-                best_move = move
+        # A score outside an already unbounded side can't be searched again with a wider window
+        if score <= alpha and alpha != float('-inf'):
+            alpha = score - delta if score != float('-inf') else float('-inf')
+        elif score >= beta and beta != float('inf'):
+            beta = score + delta if score != float('inf') else float('inf')
+        else:
+            return search
 
-            beta = min(beta, min_score)
+        delta *= 2
 
-            if score < beta:
-                killer_moves[board.turn][depth].append(move)
 
-            # fail high (beta cutoff)
-            if alpha >= beta:
-                break
+def new_game():
+    """Forgets everything learned from earlier searches: the transposition table and the move ordering heuristics."""
+    transposition_table.clear()
+    heuristics.clear()
+
+
+def share_transposition_table():
+    """
+    Moves the transposition table into shared memory, unless it is already file-backed, so helpers can use it. The
+    shared table keeps the size (e.g. from UCI's Hash option) and the entries of the one it replaces.
+    """
+    global transposition_table
 
-        type = utils.node_type(min_score, initial_alpha, initial_beta)
+    if transposition_table.mmap is None and transposition_table.shared_memory is None:
+        table = TranspositionTable.create_shared(transposition_table.size_mb)
+        table.table[:] = memoryview(transposition_table.table)
+        table.generation = transposition_table.generation
+        table.stats = transposition_table.stats
+
+        transposition_table = table
+        atexit.register(transposition_table.close)
+
+    return transposition_table.share()
+
+
+def resize_transposition_table(size_mb):
+    """
+    Replaces the transposition table with an empty one of size_mb. A persisted table is reopened instead, and keeps its
+    file's size. The helpers are stopped and restart with the new table on the next search.
+    """
+    global transposition_table
 
-        transposition_table.add_entry(hash_key, {
-            'score': min_score,
-            'best_move': best_move,
-            'depth': depth,
-            "type": type
-        })
+    utils.stop_helpers()
+    transposition_table.close()
 
-        utils.kill_helpers(abort_flag)
+    if constants.persist_transpositions:
+        transposition_table = TranspositionTable.open(constants.transpositions_filepath,
+                                                      utils.ZobristHash.key_digest, size_mb)
+    else:
+        transposition_table = TranspositionTable(size_mb)
 
-        return {
-            'score': min_score,
-            'best_move': best_move,
-            'depth': depth
-        }
 
+def find_move(board, max_depth, time_limit, *, allow_book=True, allow_tablebase=True, performance_test=True,
+              print_updates=True, score_only=False, time_manager=None, on_iteration=None, on_warning=None,
+              collect_stats=False):
+    """
+    Finds the best move with iterative deepening, unless the position is in the book or the tablebase.
+    :param board: Position to search, for the side to move
+    :param max_depth: Deepest iteration to search
+    :param time_limit: Seconds after which the search is aborted, if time_manager is not given
+    :param time_manager: TimeManager deciding when to stop, e.g. from TimeManager.from_clock
+    :param on_iteration: Called with (depth, best move, score, time_manager, stats) after each completed iteration
+    :param on_warning: Called with the message of a warning, like a failed tablebase lookup. Warnings are printed only
+                       if print_updates, so nothing is written to stdout when it is used for a protocol like UCI.
+    :param collect_stats: Count search statistics, at a small cost in speed. Helper processes are not counted.
+    :return: dict with the move, eval, depth and stats (a SearchStats, or None if not collected)
+    """
+    global current_time_manager, stats
 
-def find_move(board, max_depth, time_limit, *, allow_book=True, engine_is_maximizing=False, performance_test=True,
-              update_hash=True, print_updates=True, score_only=False):
-    clean_board = board
     board = copy.deepcopy(board)
 
     # Check if we are in an endgame
-    if len(board.piece_map()) <= 7:
+    if allow_tablebase and len(board.piece_map()) <= 7:
         try:
             tablebase_result = utils.evaluate_endgame(board)
 
@@ -233,52 +366,73 @@ def find_move(board, max_depth, time_limit, *, allow_book=True, engine_is_maximi
                 "eval": tablebase_result["eval"],
                 "move": tablebase_result["move"],
                 "depth": None,
+                "stats": None,
                 'alpha': None,
                 'beta': None
             }
 
-        except TablebaseLookupError:
-            print("WARNING: Cannot connect to lichess.ovh for tablebase lookup. Ensure internet connection is stable.")
+        except TablebaseLookupError as e:
+            warning = f"Tablebase lookup failed, searching instead. {e}"
 
-    # Check if we are in a book position
-    opening_pgns = utils.load_openings()
-    combined = '\t'.join(opening_pgns)
-    board_pgn = utils.generate_pgn(board)
+            if on_warning is not None:
+                on_warning(warning)
+            elif print_updates:
+                print(f"WARNING: {warning}")
 
-    if board_pgn in combined and allow_book:
-        continuations = []
-
-        # We are in a book position, find a continuation
-        for opening in opening_pgns:
-            if opening.startswith(board_pgn):
-                continuations.append(opening)
+    # Check if we are in a book position
+    if allow_book:
+        book_move = opening_book.get_book().choose_move(board)
 
-        if len(continuations) == 0:
-            return find_move(board, max_depth, time_limit, allow_book=False, engine_is_maximizing=engine_is_maximizing)
+        if book_move is not None:
+            return {
+                "move": board.san(book_move),
+                "eval": "Book",
+                "depth": None,
+                "stats": None,
+                'alpha': None,
+                'beta': None
+            }
 
-        continuation = random.choice(continuations)
-        continuation = re.sub(f'^{board_pgn}', '', continuation)
+    best_move = None
+    transposition_table.new_search()
+    heuristics.age()
 
-        return {
-            "move": continuation.split(' ')[0],
-            "eval": "Book",
-            "depth": None,
-            'alpha': None,
-            'beta': None
-        }
+    # Lazy SMP: helper processes search the same root at staggered depths, sharing the transposition table
+    num_helpers = min(num_helper_threads, (os.cpu_count() or 1) - 1)
 
-    best_move = None
+    if num_helpers > 0:
+        utils.start_helpers(share_transposition_table(), num_helpers)
+        utils.search_helpers(board, max_depth, transposition_table.generation)
 
     if print_updates:
         print("Searching...")
 
+    if time_manager is None:
+        time_manager = TimeManager(time_limit)
+
+    current_time_manager = time_manager
+    stats = SearchStats() if collect_stats else None
+    transposition_table.stats = stats
+    root_ply = len(board.move_stack)
+    search = None
+    depth = 0
+
     try:
         # Iterative Deepening
-        for depth in range(1, max_depth + 1):
-            start_time = time.time()
-            search = minimax(board, depth, float('-inf'), float('inf'), engine_is_maximizing,
-                             hash=utils.ZobristHash(board), root=board)
+        for iteration_depth in range(1, max_depth + 1):
+            if search is not None and not time_manager.can_start_iteration():
+                break
+
+            search = aspiration_search(board, iteration_depth, search["score"] if search is not None else None)
+            depth = iteration_depth
             best_move = search["best_move"]
+            time_manager.iteration_completed(depth)
+
+            if stats is not None:
+                stats.iteration_completed(depth, time_manager)
+
+            if on_iteration is not None:
+                on_iteration(depth, best_move, search["score"], time_manager, stats)
 
             if print_updates:
                 if best_move:
@@ -288,21 +442,38 @@ def find_move(board, max_depth, time_limit, *, allow_book=True, engine_is_maximi
             if score_only:
                 print(f"\rDepth: {depth} | Score: {search['score']}", end='')
 
-            # Abort when time limit is exceeded
-            if time.time() - start_time >= constants["time_limit"] and best_move is not None:
-                break
+    except SearchAborted:
+        # Unwind the moves the aborted iteration left on the board
+        while len(board.move_stack) > root_ply:
+            board.pop()
+
+        if root_best is not None:
+            # Part of the iteration completed, its best move has been searched deeper than the last iteration's
+            search = {"best_move": root_best[0], "score": root_best[1]}
+        elif search is None:
+            # Stopped before anything was searched
+            search = {"best_move": next(iter(board.legal_moves)), "score": 0}
 
     except KeyboardInterrupt as e:
         raise e  # TODO: allow aborting
 
+    if num_helpers > 0:
+        # Take a helper's result if it completed a deeper iteration
+        helper_results = utils.kill_helpers()
+
+        if helper_results and helper_results[0][0] > depth:
+            depth, helper_move, helper_score = helper_results[0]
+            search = {"best_move": chess.Move.from_uci(helper_move), "score": helper_score}
+
     if print_updates:
         print("\n")
 
-    if update_hash:
-        zobrist_hash.move(clean_board.parse_san(str(search["best_move"])), board)
+    transposition_table.flush()
+    transposition_table.stats = None
 
     return {
         "move": str(search["best_move"]),
         "eval": search["score"],
-        "depth": depth
+        "depth": depth,
+        "stats": stats
     }
@@ -0,0 +1,39 @@
+import chess
+
+FIFTY_MOVE_PLIES = 100
+
+
+class NodeContext:
+    def __init__(self, board):
+        """
+        What the search needs to know about a node's position, worked out from a single legal move generation instead
+        of each question generating moves (or replaying the game) again: whether the side to move is in check, its
+        legal moves, and whether the game is over. Repetitions are not checked here, the search finds them from the
+        Zobrist hash stack before probing the transposition table.
+        :param board: The node's position, it must not change while the context is used
+        """
+        self.board = board
+        self.in_check = board.is_check()
+        self.legal_moves = list(board.generate_legal_moves())
+
+        self.is_checkmate = self.in_check and not self.legal_moves
+        self.is_draw = (not self.legal_moves and not self.in_check) or board.halfmove_clock >= FIFTY_MOVE_PLIES \
+            or board.is_insufficient_material()
+
+    @property
+    def is_game_over(self):
+        return self.is_checkmate or self.is_draw
+
+    def evaluate(self, evaluator):
+        """
+        Static score of the position.
+        :param evaluator: EvaluationState kept in step with the board
+        :return: Score from the side to move's perspective, -inf if it is checkmated
+        """
+        if self.is_checkmate:
+            return float('-inf')
+
+        if self.is_draw:
+            return 0
+
+        return evaluator.score if self.board.turn == chess.WHITE else -evaluator.score
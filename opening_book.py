@@ -0,0 +1,175 @@
+import os
+import random
+import struct
+import threading
+
+import chess
+import chess.polyglot
+import utils
+from transposition_table import pack_move, unpack_move
+
+constants = utils.load_constants()
+
+# Cache format: a header followed by one record per (position, move), sorted by position key.
+# The header records the size and modification time of games.txt, so the cache is rebuilt when the games change.
+FILE_MAGIC = b"TFBK"
+FILE_VERSION = 1
+HEADER = struct.Struct("<4sHHQQI")  # magic, version, max ply, games size, games mtime (ns), record count
+RECORD = struct.Struct("<QHIIII")  # position key, packed move, count, white wins, draws, black wins
+
+RESULTS = {
+    "1-0": 0,
+    "1/2-1/2": 1,
+    "0-1": 2
+}
+
+
+class OpeningBook:
+    def __init__(self, index=None):
+        """
+        An opening book keyed by the Polyglot Zobrist hash of each position, so transpositions into a book line are
+        found too. Each position maps to the moves played from it, with move frequency and result statistics.
+        :param index: dict of position key -> {packed move: [count, white wins, draws, black wins]}
+        """
+        self.index = index if index is not None else {}
+
+    def add_game(self, moves, result, max_ply):
+        """
+        Adds the first max_ply moves of a game to the book.
+        :param moves: List of SAN moves from the starting position
+        :param result: "1-0", "1/2-1/2" or "0-1". Any other result only counts towards move frequency.
+        :param max_ply: Number of plies to add
+        """
+        board = chess.Board()
+        outcome = RESULTS.get(result)
+
+        for san in moves[:max_ply]:
+            try:
+                move = board.parse_san(san)
+            except ValueError:
+                # Corrupt line, keep what was read so far
+                break
+
+            stats = self.index.setdefault(chess.polyglot.zobrist_hash(board), {}).setdefault(pack_move(move),
+                                                                                            [0, 0, 0, 0])
+            stats[0] += 1
+
+            if outcome is not None:
+                stats[1 + outcome] += 1
+
+            board.push(move)
+
+    def probe(self, board):
+        """
+        Returns the book moves for a position, most played first.
+        :param board: chess.Board
+        :return: List of dicts with move, count, white_wins, draws and black_wins. Empty if out of book.
+        """
+        moves = self.index.get(chess.polyglot.zobrist_hash(board))
+
+        if not moves:
+            return []
+
+        entries = [{
+            "move": unpack_move(packed),
+            "count": count,
+            "white_wins": white_wins,
+            "draws": draws,
+            "black_wins": black_wins
+        } for packed, (count, white_wins, draws, black_wins) in moves.items()]
+
+        # A hash collision could point to moves from another position
+        entries = [entry for entry in entries if board.is_legal(entry["move"])]
+        entries.sort(key=lambda x: x["count"], reverse=True)
+
+        return entries
+
+    def choose_move(self, board):
+        """
+        Picks a book move at random, weighted by how often it was played.
+        :return: chess.Move, or None if the position is out of book
+        """
+        entries = self.probe(board)
+
+        if not entries:
+            return None
+
+        return random.choices([entry["move"] for entry in entries], [entry["count"] for entry in entries])[0]
+
+    def save(self, filepath, games_stat, max_ply):
+        records = []
+
+        for key in sorted(self.index):
+            for packed, stats in self.index[key].items():
+                records.append(RECORD.pack(key, packed, *stats))
+
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+
+        with open(filepath, 'wb') as f:
+            f.write(HEADER.pack(FILE_MAGIC, FILE_VERSION, max_ply, games_stat.st_size, games_stat.st_mtime_ns,
+                                len(records)))
+            f.write(b''.join(records))
+
+    @staticmethod
+    def load(filepath, games_stat, max_ply):
+        """
+        Loads a cached book.
+        :return: OpeningBook, or None if there is no cache or it is out of date
+        """
+        if not os.path.exists(filepath):
+            return None
+
+        with open(filepath, 'rb') as f:
+            data = f.read()
+
+        if len(data) < HEADER.size:
+            return None
+
+        magic, version, file_max_ply, games_size, games_mtime, num_records = HEADER.unpack_from(data)
+
+        if (magic, version, file_max_ply, games_size, games_mtime) != \
+                (FILE_MAGIC, FILE_VERSION, max_ply, games_stat.st_size, games_stat.st_mtime_ns) \
+                or len(data) != HEADER.size + num_records * RECORD.size:
+            return None
+
+        index = {}
+
+        for key, packed, *stats in RECORD.iter_unpack(memoryview(data)[HEADER.size:]):
+            index.setdefault(key, {})[packed] = stats
+
+        return OpeningBook(index)
+
+    @staticmethod
+    def build(max_ply):
+        """Compiles the book from assets/json/games.txt, one game per line followed by its result."""
+        self = OpeningBook()
+
+        for line in utils.load_openings():
+            tokens = line.split()
+
+            if tokens:
+                self.add_game(tokens[:-1], tokens[-1], max_ply)
+
+        return self
+
+
+_book = None
+_book_lock = threading.Lock()  # UCI loads the book on isready, which can come while a search is running
+
+
+def get_book():
+    """Returns the opening book, loading it from the cache (or building and caching it) on first use."""
+    global _book
+
+    with _book_lock:
+        if _book is None:
+            games_stat = os.stat(constants.games_filepath)
+            max_ply = constants.book_max_ply
+
+            _book = OpeningBook.load(constants.book_filepath, games_stat, max_ply)
+
+            if _book is None:
+                _book = OpeningBook.build(max_ply)
+                _book.save(constants.book_filepath, games_stat, max_ply)
+
+    return _book
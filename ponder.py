@@ -0,0 +1,154 @@
+import atexit
+import multiprocessing
+import signal
+import threading
+
+import chess
+
+PONDER_DEPTH = 64
+
+
+def encode_board(board):
+    """Root FEN and UCI moves, so the board can be rebuilt in another process with its history."""
+    return board.root().fen(), [move.uci() for move in board.move_stack]
+
+
+def decode_board(root_fen, moves):
+    board = chess.Board(root_fen)
+
+    for move in moves:
+        board.push(chess.Move.from_uci(move))
+
+    return board
+
+
+class BackgroundSearch:
+    def __init__(self, board, max_depth, time_manager, allow_book, pondering):
+        """
+        Runs find_move in a thread of the worker process.
+        :param pondering: Whether this is a search of the expected reply, not yet on the clock
+        """
+        import minimax
+
+        self.key = encode_board(board)
+        self.time_manager = time_manager
+        self.pondering = pondering
+        self.result = None
+
+        def run():
+            self.result = minimax.find_move(board, max_depth, None, allow_book=allow_book, print_updates=False,
+                                            time_manager=time_manager)
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.time_manager.stop()
+        self.thread.join()
+
+
+def expected_reply(board):
+    """The move the opponent is expected to play: the best move stored in the transposition table, or a quick search."""
+    import minimax
+    import utils
+
+    entry = minimax.transposition_table.probe(utils.ZobristHash(board).current_hash)
+
+    if entry is not None and entry["best_move"] and board.is_legal(entry["best_move"]):
+        return entry["best_move"]
+
+    if board.is_game_over():
+        return None
+
+    result = minimax.find_move(board, 2, None, allow_book=False, print_updates=False)
+
+    return board.parse_san(result["move"])
+
+
+def worker_main(commands, results):
+    """
+    Entry point of the ponder worker. Keeps one search running in the background and answers search requests, reusing
+    the pondering search when the opponent played the expected reply.
+    """
+    import opening_book
+    from time_manager import TimeManager
+
+    # Ctrl+C is handled by the main process, which then tells the worker to quit
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    search = None
+
+    while True:
+        command, *args = commands.get()
+
+        if command == "quit":
+            if search is not None:
+                search.stop()
+
+            break
+
+        board = decode_board(*args[:2])
+
+        if command == "ponder":
+            if search is not None:
+                search.stop()
+
+            reply = expected_reply(board)
+
+            if reply is None:
+                search = None
+                continue
+
+            board.push(reply)
+            search = BackgroundSearch(board, PONDER_DEPTH, TimeManager(), False, True)
+
+        elif command == "search":
+            max_depth, time_limit, allow_book = args[2:]
+
+            if search is not None and search.pondering and search.key == encode_board(board) \
+                    and not (allow_book and opening_book.get_book().probe(board)):
+                # Ponder hit, keep the search going but put it on the clock
+                search.pondering = False
+                search.time_manager.ponderhit(time_limit, max_depth=max_depth)
+            else:
+                # Ponder miss, search the actual position. The transposition table is kept.
+                if search is not None:
+                    search.stop()
+
+                search = BackgroundSearch(board, max_depth, TimeManager(time_limit), allow_book, False)
+
+            search.thread.join()
+            results.put(search.result)
+            search = None
+
+
+class PonderWorker:
+    def __init__(self, process_class=multiprocessing.Process):
+        """
+        A long-lived process that does all of the engine's searching. Between moves it ponders on the opponent's
+        expected reply; because it keeps its transposition table, work from pondering and from earlier moves is reused.
+        :param process_class: Process class to start the worker with (main.py uses one that works in the frozen EXE)
+        """
+        self.commands = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.process = process_class(target=worker_main, args=(self.commands, self.results))
+        self.process.start()
+
+        atexit.register(self.quit)
+
+    def ponder(self, board):
+        """Starts pondering while the opponent thinks about their move in board."""
+        self.commands.put(("ponder", *encode_board(board)))
+
+    def search(self, board, max_depth, time_limit, allow_book=True):
+        """
+        Finds the engine's move, continuing the pondering search if the opponent played the expected reply.
+        :return: The result of find_move
+        """
+        self.commands.put(("search", *encode_board(board), max_depth, time_limit, allow_book))
+        return self.results.get()
+
+    def quit(self):
+        if self.process.is_alive():
+            self.commands.put(("quit",))
+            self.process.join()
@@ -1,48 +1,147 @@
+import chess
+
 from evaluate_position import evaluate_position
 import utils
 
 constants = utils.load_constants()
 
+TT_DEPTH = 0  # Depth quiescence entries are stored at, so they only cut off at the main search's leaves
+BIG_DELTA = constants.piece_values[chess.QUEEN]  # The most a capture can gain, bar promotions
+PROMOTION_RANKS = chess.BB_RANK_1 | chess.BB_RANK_8
+
+
+def generate_tactical_moves(board):
+    """Legal captures and quiet promotions, generated without the quiet moves."""
+    yield from board.generate_legal_captures()
+    yield from board.generate_legal_moves(board.pawns, PROMOTION_RANKS & ~board.occupied)
+
+
+def tactical_order(board, move):
+    # Promotions are searched before captures of the same victim
+    return (utils.mvv_lva(board, move) if board.is_capture(move) else 0) + (move.promotion or 0)
+
+
+def qsearch_stand_pat(board, evaluator):
+    """
+    Evaluation from the side to move's perspective (negamax). Quiescence nodes skip evaluate_position's game-over
+    checks, each of which generates moves or replays the game; mates are found from the evasions instead.
+    """
+    score = evaluator.score if evaluator is not None else evaluate_position(board)
+    return score if board.turn == chess.WHITE else -score
 
-def is_eligible_quiescence_move(move, board):
-    if board.is_capture(move):
-        if utils.see_capture(move, board) > 0:
-            return True
 
-    return False
+def quiescence_search(board, alpha, beta, depth=constants.quiescent_depth, evaluator=None, time_manager=None,
+                      stats=None, hash=None, transposition_table=None):
+    """
+    Searches captures and promotions until the position is quiet, so the main search never stops in the middle of an
+    exchange. In check, every evasion is searched instead, and having none is checkmate.
+    :param depth: Plies left before the static evaluation is returned as is
+    :param hash: ZobristHash kept in step with board, needed to use the transposition table
+    :param transposition_table: Table to probe and store quiescence results in, at TT_DEPTH. Positions the main search
+                                stored deeper results for are only probed.
+    :return: Score from the side to move's perspective
+    """
+    if time_manager is not None:
+        time_manager.count_qnode()
 
+    hash_move = None
+    store = transposition_table is not None
 
-def quiescence_search(board, alpha, beta, depth=constants["quiescent_depth"]):
-    if depth == 0:
-        return evaluate_position(board)
+    if transposition_table is not None:
+        entry = transposition_table.probe(hash.current_hash)
 
-    stand_pat = evaluate_position(board)
+        if entry is not None:
+            if entry["depth"] >= TT_DEPTH and (entry["type"] == "exact"
+                                               or entry["type"] == "upperbound" and entry["score"] <= alpha
+                                               or entry["type"] == "lowerbound" and entry["score"] >= beta):
+                if stats is not None:
+                    stats.tt_cutoffs[entry["type"]] += 1
 
-    if stand_pat >= beta:
-        return beta
+                return entry["score"]
 
-    if alpha < stand_pat:
-        alpha = stand_pat
+            hash_move = entry["best_move"]
 
-    for capture in [move for move in board.legal_moves if is_eligible_quiescence_move(move, board)]:
-        # Delta pruning
-        BIG_DELTA = constants["piece_values"]["6"]
+            # Never replace a main search result, even with an exact one; it is searched deeper than any qsearch
+            store = entry["depth"] <= TT_DEPTH
 
-        if capture.promotion:
-            BIG_DELTA += 7.75
+    initial_alpha = alpha
+    in_check = board.is_check()
+
+    if in_check:
+        moves = list(board.generate_legal_moves())
+
+        if not moves:
+            return float('-inf')  # Checkmated
+
+        stand_pat = None
+    else:
+        stand_pat = qsearch_stand_pat(board, evaluator)
+
+        if depth <= 0:
+            return stand_pat
+
+        if stand_pat >= beta:
+            if stats is not None:
+                stats.stand_pat_cutoffs += 1
+
+            return beta
 
-        if stand_pat < alpha - BIG_DELTA:
+        # Delta pruning: not even winning a queen would reach alpha
+        if stand_pat + BIG_DELTA < alpha and not board.pawns & board.occupied_co[board.turn] & (
+                chess.BB_RANK_7 if board.turn else chess.BB_RANK_2):
             return alpha
 
-        board.push(capture)
-        score = -quiescence_search(board, -beta, -alpha, depth - 1)
+        if alpha < stand_pat:
+            alpha = stand_pat
+
+        moves = list(generate_tactical_moves(board))
+
+    if depth <= 0:
+        # Out of depth in check, there is no quiet position to stop at
+        return qsearch_stand_pat(board, evaluator)
+
+    moves.sort(key=lambda move: tactical_order(board, move), reverse=True)
+
+    if hash_move in moves:
+        moves.remove(hash_move)
+        moves.insert(0, hash_move)
+
+    best_move = None
+
+    for move in moves:
+        # Captures that lose material can't improve on standing pat
+        if not in_check and not move.promotion and not utils.see_ge(board, move):
+            continue
+
+        if hash is not None:
+            hash.move(move, board)
+
+        if evaluator is not None:
+            evaluator.push(board, move)
+
+        board.push(move)
+        score = -quiescence_search(board, -beta, -alpha, depth - 1, evaluator, time_manager, stats, hash,
+                                   transposition_table)
         board.pop()
 
+        if evaluator is not None:
+            evaluator.pop()
+
+        if hash is not None:
+            hash.pop(move, board)
+
         if score >= beta:
+            if store:
+                transposition_table.store(hash.current_hash, beta, move, TT_DEPTH, "lowerbound")
+
             return beta
 
         if score > alpha:
             alpha = score
+            best_move = move
 
-    return alpha
+    if store:
+        transposition_table.store(hash.current_hash, alpha, best_move, TT_DEPTH,
+                                  "exact" if alpha > initial_alpha else "upperbound")
 
+    return alpha
@@ -0,0 +1,97 @@
+from array import array
+
+import chess
+
+from transposition_table import pack_move, unpack_move
+
+MAX_PLY = 128  # Deepest ply with killer moves, deeper nodes just go without
+KILLER_SLOTS = 2
+MAX_HISTORY = 16384  # History scores stay within +-MAX_HISTORY
+
+
+def move_index(move):
+    return move.from_square * 64 + move.to_square
+
+
+class SearchHeuristics:
+    def __init__(self):
+        """
+        Move ordering knowledge gathered from cutoffs, in fixed-size arrays:
+        - killers: the last KILLER_SLOTS quiet moves that caused a cutoff at each ply
+        - history: per color and from/to squares, how often a quiet move caused cutoffs, with gravity towards 0 so
+          scores stay bounded and adapt
+        - countermoves: per color and from/to squares of the opponent's last move, the quiet move that refuted it
+        Moves are stored packed as in the transposition table, 0 is an empty slot.
+        """
+        self.killers = array('H', [0]) * (MAX_PLY * KILLER_SLOTS)
+        self.history = [array('l', [0]) * 4096, array('l', [0]) * 4096]  # Indexed by color, chess.BLACK is 0
+        self.countermoves = [array('H', [0]) * 4096, array('H', [0]) * 4096]
+
+    def clear(self):
+        """Forgets everything, e.g. for a new game."""
+        self.killers[:] = array('H', [0]) * len(self.killers)
+
+        for color in chess.COLORS:
+            self.history[color][:] = array('l', [0]) * 4096
+            self.countermoves[color][:] = array('H', [0]) * 4096
+
+    def age(self):
+        """
+        Prepares for the next search: killers are specific to the previous search's plies and are cleared, history is
+        halved so it keeps ordering moves but adapts to the new position.
+        """
+        self.killers[:] = array('H', [0]) * len(self.killers)
+
+        for color in chess.COLORS:
+            history = self.history[color]
+
+            for i in range(4096):
+                history[i] //= 2
+
+    def killer_moves(self, ply):
+        """:return: The killer moves of ply, most recent first"""
+        if ply >= MAX_PLY:
+            return []
+
+        base = ply * KILLER_SLOTS
+        return [unpack_move(packed) for packed in self.killers[base:base + KILLER_SLOTS] if packed]
+
+    def countermove(self, board):
+        """:return: The stored reply to the opponent's last move, or None"""
+        if not board.move_stack or not board.move_stack[-1]:
+            return None
+
+        return unpack_move(self.countermoves[board.turn][move_index(board.move_stack[-1])])
+
+    def update(self, board, move, ply, depth, quiets_searched):
+        """
+        Records a quiet move that caused a beta cutoff.
+        :param board: The position the move was played from
+        :param move: The cutoff move
+        :param ply: Distance from the root
+        :param depth: Remaining depth, deeper cutoffs get a bigger history bonus
+        :param quiets_searched: Quiet moves searched before move without a cutoff, their history is lowered
+        """
+        if ply < MAX_PLY:
+            base = ply * KILLER_SLOTS
+            packed = pack_move(move)
+
+            if self.killers[base] != packed:
+                self.killers[base + 1:base + KILLER_SLOTS] = self.killers[base:base + KILLER_SLOTS - 1]
+                self.killers[base] = packed
+
+        history = self.history[board.turn]
+        bonus = min(depth * depth, MAX_HISTORY)
+
+        self._add_history(history, move_index(move), bonus)
+
+        for quiet in quiets_searched:
+            self._add_history(history, move_index(quiet), -bonus)
+
+        if board.move_stack and board.move_stack[-1]:
+            self.countermoves[board.turn][move_index(board.move_stack[-1])] = pack_move(move)
+
+    @staticmethod
+    def _add_history(history, index, bonus):
+        # Gravity: the closer a score is to MAX_HISTORY, the less a bonus moves it
+        history[index] += bonus - history[index] * abs(bonus) // MAX_HISTORY
@@ -0,0 +1,76 @@
+BOUND_NAMES = ("exact", "lowerbound", "upperbound")
+
+
+class SearchStats:
+    def __init__(self):
+        """
+        Counters describing how a search went. Searches only collect them when find_move is called with
+        collect_stats=True; otherwise the search keeps None instead of a SearchStats, and every counter is skipped by a
+        single `is not None` check.
+        """
+        self.iterations = []  # dict with depth, nodes, qnodes and seconds of each completed iteration
+
+        # Transposition table
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = {bound: 0 for bound in BOUND_NAMES}
+
+        # Move loop
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.lmr_reductions = 0
+        self.lmr_researches = 0
+        self.futility_pruned = 0
+        self.extensions = 0
+        self.null_move_cutoffs = 0
+        self.null_move_verifications = 0  # Null move cutoffs that had to be confirmed by a reduced search
+
+        # Quiescence search
+        self.stand_pat_cutoffs = 0
+
+    def iteration_completed(self, depth, time_manager):
+        """Records the nodes of an iteration, from the totals the time manager counted."""
+        nodes = time_manager.nodes - sum(iteration["nodes"] for iteration in self.iterations)
+        qnodes = time_manager.qnodes - sum(iteration["qnodes"] for iteration in self.iterations)
+
+        self.iterations.append({
+            "depth": depth,
+            "nodes": nodes,
+            "qnodes": qnodes,
+            "seconds": time_manager.elapsed()
+        })
+
+    def first_move_cutoff_rate(self):
+        """Fraction of beta cutoffs caused by the first move searched, a measure of move ordering."""
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else None
+
+    def tt_hit_rate(self):
+        return self.tt_hits / self.tt_probes if self.tt_probes else None
+
+    def as_dict(self):
+        stats = dict(vars(self))
+        stats["iterations"] = [dict(iteration) for iteration in self.iterations]
+        stats["tt_cutoffs"] = dict(self.tt_cutoffs)
+        stats["first_move_cutoff_rate"] = self.first_move_cutoff_rate()
+        stats["tt_hit_rate"] = self.tt_hit_rate()
+
+        return stats
+
+    def __str__(self):
+        lines = [f"Depth {iteration['depth']}: {iteration['nodes']} nodes ({iteration['qnodes']} quiescence), "
+                 f"{iteration['seconds']:.2f} s" for iteration in self.iterations]
+
+        hit_rate = self.tt_hit_rate()
+        cutoff_rate = self.first_move_cutoff_rate()
+
+        lines.append(f"TT: {self.tt_probes} probes, {self.tt_hits} hits"
+                     + (f" ({hit_rate:.1%})" if hit_rate is not None else "")
+                     + ", cutoffs " + ", ".join(f"{bound} {count}" for bound, count in self.tt_cutoffs.items()))
+        lines.append(f"Beta cutoffs: {self.beta_cutoffs}"
+                     + (f" ({cutoff_rate:.1%} on the first move)" if cutoff_rate is not None else ""))
+        lines.append(f"LMR: {self.lmr_reductions} reductions, {self.lmr_researches} re-searches")
+        lines.append(f"Null move cutoffs: {self.null_move_cutoffs}, {self.null_move_verifications} verified")
+        lines.append(f"Futility pruned moves: {self.futility_pruned}, extensions: {self.extensions}")
+        lines.append(f"Quiescence stand pat cutoffs: {self.stand_pat_cutoffs}")
+
+        return "\n".join(lines)
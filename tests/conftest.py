@@ -0,0 +1,15 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The modules live at the top of the repo and read their assets relative to it
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+@pytest.fixture
+def rng():
+    return random.Random(0)
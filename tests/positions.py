@@ -0,0 +1,24 @@
+import random
+
+import chess
+
+
+def random_positions(count, seed=0, max_plies=80):
+    """Positions from random games, with a move history so pushes, pops and repetitions can be tested."""
+    rng = random.Random(seed)
+    positions = []
+
+    while len(positions) < count:
+        board = chess.Board()
+
+        for _ in range(rng.randrange(max_plies)):
+            moves = list(board.legal_moves)
+
+            if not moves:
+                break
+
+            board.push(rng.choice(moves))
+
+        positions.append(board)
+
+    return positions
@@ -0,0 +1,16 @@
+import numpy as np
+
+from evaluate_batch import evaluate_positions
+from evaluate_position import static_score
+from positions import random_positions
+
+
+def test_batch_matches_scalar():
+    boards = random_positions(500, seed=2, max_plies=160)
+    expected = np.array([static_score(board) for board in boards])
+
+    np.testing.assert_allclose(evaluate_positions(boards), expected, atol=1e-9)
+
+
+def test_empty_batch():
+    assert evaluate_positions([]).shape == (0,)
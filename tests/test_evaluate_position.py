@@ -0,0 +1,58 @@
+import chess
+import pytest
+
+from evaluate_position import EvaluationState, static_score
+
+
+def push(board, state, move):
+    state.push(board, move)
+    board.push(move)
+    assert state.score == pytest.approx(static_score(board)), f"{board.fen()} after {move}"
+
+
+def test_incremental_score_over_random_games(rng):
+    """Every move of random games, with null moves and takebacks, against the score computed from scratch."""
+    for _ in range(40):
+        board = chess.Board()
+        state = EvaluationState(board)
+        start_score = state.score
+
+        for _ in range(150):
+            moves = list(board.legal_moves)
+
+            if not moves:
+                break
+
+            roll = rng.random()
+
+            if roll < 0.1 and board.move_stack:
+                board.pop()
+                state.pop()
+                assert state.score == pytest.approx(static_score(board))
+            elif roll < 0.15 and not board.is_check():
+                push(board, state, chess.Move.null())
+            else:
+                push(board, state, rng.choice(moves))
+
+        while board.move_stack:
+            board.pop()
+            state.pop()
+
+        assert state.score == start_score
+        assert state.stack == []
+
+
+@pytest.mark.parametrize("fen, uci", [
+    ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "e1g1"),
+    ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "e1c1"),
+    ("r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1", "e8g8"),
+    ("r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1", "e8c8"),
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 2", "e5d6"),
+    ("4k3/8/8/8/3Pp3/8/8/4K3 b - d3 0 2", "e4d3"),
+    ("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1", "a7a8q"),
+    ("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1", "a7b8n"),
+    ("4k3/8/8/8/8/8/p7/1R2K3 b - - 0 1", "a2b1r"),
+])
+def test_special_moves(fen, uci):
+    board = chess.Board(fen)
+    push(board, EvaluationState(board), chess.Move.from_uci(uci))
@@ -0,0 +1,61 @@
+import threading
+
+import chess
+import pytest
+
+import minimax
+
+MATE_FEN = "7k/8/5K2/8/8/8/8/R7 w - - 0 1"  # White mates in 2 with Kg6
+
+
+def find_move_in_thread(board, depth, seconds=60):
+    """find_move with no time limit, run in a thread so a search that never ends fails the test instead of hanging it."""
+    result = {}
+
+    def search():
+        result.update(minimax.find_move(board, depth, None, allow_book=False, allow_tablebase=False,
+                                        print_updates=False))
+
+    thread = threading.Thread(target=search, daemon=True)
+    thread.start()
+    thread.join(seconds)
+
+    assert not thread.is_alive(), f"search of {board.fen()} to depth {depth} did not finish"
+    return result
+
+
+@pytest.mark.parametrize("depth, mirror", [(3, False), (4, False), (4, True)])
+def test_forced_mate_at_fixed_depth(depth, mirror):
+    """Mate scores are unbounded, so they fall outside every aspiration window; the re-searches must still end."""
+    board = chess.Board(MATE_FEN)
+
+    if mirror:
+        board = board.mirror()
+
+    minimax.new_game()
+    result = find_move_in_thread(board, depth)
+
+    assert result["eval"] == (float('-inf') if mirror else float('inf'))
+
+
+def test_shared_table_keeps_size_and_entries():
+    """Helpers get the table moved into shared memory, which must not undo UCI's Hash option."""
+    old_table = minimax.transposition_table
+
+    try:
+        minimax.transposition_table = minimax.TranspositionTable(4)
+        minimax.transposition_table.new_search()
+        minimax.transposition_table.store(12345, 1.5, chess.Move.from_uci("e2e4"), 3, "exact")
+
+        minimax.share_transposition_table()
+        table = minimax.transposition_table
+
+        assert table.shared_memory is not None
+        assert table.size_mb == 4
+        assert table.generation == 1
+        assert table.probe(12345) == {"score": 1.5, "best_move": chess.Move.from_uci("e2e4"), "depth": 3,
+                                      "type": "exact"}
+
+        table.close()
+    finally:
+        minimax.transposition_table = old_table
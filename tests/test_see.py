@@ -0,0 +1,33 @@
+import chess
+import pytest
+
+import utils
+from positions import random_positions
+
+PAWN = utils.load_constants().piece_values[chess.PAWN]
+KNIGHT = utils.load_constants().piece_values[chess.KNIGHT]
+ROOK = utils.load_constants().piece_values[chess.ROOK]
+
+
+def test_see_ge_agrees_with_see():
+    """see_ge stops the exchange early, so it is checked against the full exchange at thresholds around its value."""
+    for board in random_positions(300, seed=1):
+        for move in board.legal_moves:
+            # The memo is keyed by threshold, so each see_ge answer is worked out on its own, not taken from see's
+            value = utils.see(board, move)
+
+            for threshold in sorted({-ROOK, -PAWN, 0, PAWN, KNIGHT, ROOK, value, value - 0.01, value + 0.01}):
+                assert utils.see_ge(board, move, threshold) == (value >= threshold), \
+                    f"{board.fen()} {move} {threshold} (see {value})"
+
+
+@pytest.mark.parametrize("fen, uci, expected", [
+    ("4k3/8/8/3p4/4P3/8/8/4K3 w - - 0 1", "e4d5", PAWN),  # Free pawn
+    ("4k3/8/2p5/3p4/4P3/8/8/4K3 w - - 0 1", "e4d5", 0),  # Pawn for pawn
+    ("4k3/8/2p5/3p4/8/8/8/3QK3 w - - 0 1", "d1d5", PAWN - utils.load_constants().piece_values[chess.QUEEN]),
+    ("4k3/8/8/3r4/8/8/3R4/3RK3 w - - 0 1", "d2d5", ROOK),  # Rook defended from behind by the x-ray
+    ("4k3/8/8/8/8/8/8/4K3 w - - 0 1", "e1e2", 0),  # Quiet move
+])
+def test_see_values(fen, uci, expected):
+    board = chess.Board(fen)
+    assert utils.see(board, chess.Move.from_uci(uci)) == pytest.approx(expected)
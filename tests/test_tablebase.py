@@ -0,0 +1,262 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import chess
+import pytest
+
+import utils
+from errors import TablebaseLookupError
+from utils.tablebase import LichessTablebase, SyzygyTablebase, TablebaseCache, TablebaseProber, normalize_fen
+
+KQK_FEN = "8/8/8/4k3/8/8/8/KQ6 w - - 0 1"
+
+
+# Cache
+
+def test_cache_round_trip(tmp_path):
+    cache = TablebaseCache(str(tmp_path / "cache.sqlite3"), 10)
+    cache.put("a", {"category": "win", "moves": []})
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.get("a") == {"category": "win", "moves": []}
+    assert cache.get("b") is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = TablebaseCache(str(tmp_path / "cache.sqlite3"), 3)
+
+    for fen in "abc":
+        cache.put(fen, fen)
+
+    cache.get("a")  # b is now the least recently used
+    cache.put("d", "d")
+
+    assert [fen in cache for fen in "abcd"] == [True, False, True, True]
+
+    cache.get("c")
+    cache.get("d")
+    cache.put("e", "e")
+
+    assert [fen in cache for fen in "acde"] == [False, True, True, True]
+
+
+def test_cache_capacity(tmp_path):
+    """Lookups advance the clock too; however many there are, the cache still holds max_entries results."""
+    filepath = str(tmp_path / "cache.sqlite3")
+    cache = TablebaseCache(filepath, 5)
+
+    for i in range(20):
+        cache.put(str(i), i)
+
+        for _ in range(10):
+            cache.get(str(i))
+
+    cache.put("19", 19)  # Replacing an entry doesn't evict another
+    assert [str(i) in cache for i in range(20)] == [False] * 15 + [True] * 5
+
+    # Reopened, it keeps its entries and their order
+    cache.connection.close()
+    cache = TablebaseCache(filepath, 5)
+    cache.get("15")
+    cache.put("new", 0)
+
+    assert "15" in cache and "16" not in cache and "new" in cache
+
+
+# HTTP backend, against a stub of the lichess API
+
+class StubHandler(BaseHTTPRequestHandler):
+    responses = {}  # FEN -> (status, body)
+    requests = []
+
+    def do_GET(self):
+        fen = parse_qs(urlparse(self.path).query)["fen"][0]
+        StubHandler.requests.append(fen)
+        status, body = self.responses.get(fen, (404, b"not found"))
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    StubHandler.responses = {}
+    StubHandler.requests = []
+
+    yield f"http://127.0.0.1:{server.server_address[1]}/standard"
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_backend(stub_server):
+    board = chess.Board(KQK_FEN)
+    result = {"category": "win", "dtz": 19, "dtm": 19, "moves": [{"uci": "b1b5", "san": "Qb5+", "category": "loss"}]}
+    StubHandler.responses[board.fen()] = (200, json.dumps(result).encode())
+
+    backend = LichessTablebase(stub_server, timeout=5)
+
+    assert backend.probe(board) == result
+    assert StubHandler.requests == [board.fen()]
+
+
+@pytest.mark.parametrize("status, body", [(404, b"not found"), (500, b"{}"), (200, b"not json")])
+def test_http_backend_errors(stub_server, status, body):
+    board = chess.Board(KQK_FEN)
+    StubHandler.responses[board.fen()] = (status, body)
+
+    with pytest.raises(TablebaseLookupError):
+        LichessTablebase(stub_server, timeout=5).probe(board)
+
+
+def test_http_backend_unreachable():
+    with pytest.raises(TablebaseLookupError):
+        LichessTablebase("http://127.0.0.1:9/standard", timeout=1).probe(chess.Board(KQK_FEN))
+
+
+# Syzygy move ordering
+
+class FakeSyzygy:
+    """Stands in for python-chess' tablebase with fixed WDL and DTZ values for the positions after each move."""
+    def __init__(self, values):
+        self.values = values  # EPD -> (wdl, dtz), from the side to move there
+
+    def probe_wdl(self, board):
+        return self.values.get(board.epd(), (0, 0))[0]
+
+    def probe_dtz(self, board):
+        return self.values.get(board.epd(), (0, 0))[1]
+
+
+def fake_syzygy(values):
+    backend = SyzygyTablebase.__new__(SyzygyTablebase)
+    backend.tablebase = FakeSyzygy(values)
+    return backend
+
+
+def after(board, uci):
+    board = board.copy()
+    board.push_uci(uci)
+    return board.epd()
+
+
+def test_syzygy_move_order():
+    """Best first: moves that leave the opponent lost, mates first, then draws, then losses."""
+    board = chess.Board("6k1/8/6K1/8/8/8/8/R7 w - - 0 1")
+    values = {
+        board.epd(): (2, 1),
+        after(board, "a1a7"): (-2, -6),
+        after(board, "a1a2"): (-2, -2),
+        after(board, "g6f6"): (0, 0),
+        after(board, "a1a6"): (2, 3),
+    }
+    result = fake_syzygy(values).probe(board)
+    order = [move["uci"] for move in result["moves"]]
+
+    assert result["category"] == "win"
+    assert order[0] == "a1a8"  # Checkmate
+    assert order[1:3] == ["a1a2", "a1a7"]  # Then the quickest win, the opponent's DTZ nearest zero
+    assert order[-1] == "a1a6"  # A move that lets the opponent win is last
+    assert all(move["category"] == "draw" for move in result["moves"][3:-1])
+
+
+def test_syzygy_rejects_castling_rights():
+    with pytest.raises(TablebaseLookupError):
+        fake_syzygy({}).probe(chess.Board("4k3/8/8/8/8/8/8/4K2R w K - 0 1"))
+
+
+SYZYGY_PATH = utils.load_constants().syzygy_path
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(SYZYGY_PATH, "KQvK.rtbz")), reason="No KQvK Syzygy tables")
+def test_syzygy_tables():
+    board = chess.Board(KQK_FEN)
+    result = SyzygyTablebase(SYZYGY_PATH).probe(board)
+
+    assert result["category"] == "win"
+    assert result["moves"][0]["category"] == "loss"
+
+    best = chess.Move.from_uci(result["moves"][0]["uci"])
+    board.push(best)
+    assert not board.is_stalemate()
+
+
+# Prober
+
+class CountingBackend:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.probed = []
+        self.lock = threading.Lock()
+
+    def probe(self, board):
+        with self.lock:
+            self.probed.append(normalize_fen(board))
+
+        if self.fail:
+            raise TablebaseLookupError("down")
+
+        return {"category": "draw", "dtz": 0, "dtm": None, "moves": [], "fen": board.fen()}
+
+
+def test_prober_falls_back_and_caches(tmp_path):
+    first = CountingBackend(fail=True)
+    second = CountingBackend()
+    prober = TablebaseProber([first, second], TablebaseCache(str(tmp_path / "cache.sqlite3"), 100), prefetch=False)
+    board = chess.Board(KQK_FEN)
+
+    assert prober.probe(board)["category"] == "draw"
+    assert prober.probe(board)["category"] == "draw"  # From the cache
+    assert len(first.probed) == len(second.probed) == 1
+
+
+def test_prober_reports_every_error():
+    prober = TablebaseProber([CountingBackend(fail=True), CountingBackend(fail=True)], prefetch=False)
+
+    with pytest.raises(TablebaseLookupError, match="down; down"):
+        prober.probe(chess.Board(KQK_FEN))
+
+
+def test_prefetch(tmp_path):
+    backend = CountingBackend()
+    prober = TablebaseProber([backend], TablebaseCache(str(tmp_path / "cache.sqlite3"), 100))
+    board = chess.Board(KQK_FEN)
+    replies = []
+
+    for move in board.legal_moves:
+        board.push(move)
+        replies.append(board.copy(stack=False))
+        board.pop()
+
+    prober.probe(replies[0])
+    prober.prefetch(replies + [chess.Board()])  # Already cached and too many pieces are skipped
+    prober.executor.shutdown(wait=True)
+
+    assert sorted(backend.probed) == sorted(normalize_fen(reply) for reply in replies)
+
+    # The lookups after the prefetch all hit the cache
+    for reply in replies:
+        prober.probe(reply)
+
+    assert len(backend.probed) == len(replies)
+
+
+def test_prefetch_disabled(tmp_path):
+    prober = TablebaseProber([CountingBackend()], TablebaseCache(str(tmp_path / "cache.sqlite3"), 100), prefetch=False)
+    prober.prefetch([chess.Board(KQK_FEN)])
+
+    assert prober.executor is None
@@ -0,0 +1,132 @@
+import chess
+import pytest
+
+import transposition_table as tt
+from transposition_table import TranspositionTable
+
+KEY_DIGEST = bytes(32)
+
+
+def slots(table, hash):
+    """(index of the check word, data word) of each slot in hash's bucket."""
+    base = (hash & table.bucket_mask) * tt.BUCKET_SIZE * tt.SLOT_WORDS
+    return [(i, table.table[i + 1]) for i in range(base, base + tt.BUCKET_SIZE * tt.SLOT_WORDS, tt.SLOT_WORDS)]
+
+
+def same_bucket(table, hash, count):
+    """count other hashes that fall in the same bucket as hash."""
+    return [hash + table.num_buckets * i for i in range(1, count + 1)]
+
+
+@pytest.mark.parametrize("uci", [None, "e2e4", "a7a8q", "h2h1n", "e1g1"])
+def test_move_round_trip(uci):
+    move = chess.Move.from_uci(uci) if uci else None
+    assert tt.unpack_move(tt.pack_move(move)) == move
+
+
+@pytest.mark.parametrize("score", [0, 1.5, -3.25, 0.001, -99999.999, float('inf'), float('-inf')])
+def test_score_round_trip(score):
+    assert tt.unpack_score(tt.pack_score(score)) == score
+
+
+@pytest.mark.parametrize("depth, type", [(0, "exact"), (-3, "upperbound"), (12, "lowerbound"), (127, "exact")])
+def test_probe_after_store(depth, type):
+    table = TranspositionTable(1)
+    hash = 0x9D39247E33776D41
+    move = chess.Move.from_uci("g1f3")
+
+    table.store(hash, -1.234, move, depth, type)
+
+    assert table.probe(hash) == {"score": -1.234, "best_move": move, "depth": depth, "type": type}
+    assert table.probe(hash ^ 1) is None
+
+
+def test_corrupted_slot_is_rejected():
+    """A slot torn by two processes storing at once no longer verifies, so it reads as missing."""
+    table = TranspositionTable(1)
+    hash = 0x2AF7398005AAA5C7
+
+    table.store(hash, 0.5, chess.Move.from_uci("e2e4"), 4, "exact")
+    index = next(i for i, data in slots(table, hash) if data)
+    table.table[index + 1] ^= 1 << tt.SCORE_SHIFT
+
+    assert table.probe(hash) is None
+
+
+def test_store_updates_key_after_empty_slot():
+    """A key stored behind an empty slot is updated in place, never copied into the empty slot."""
+    table = TranspositionTable(1)
+    hash = 12345
+    first, = same_bucket(table, hash, 1)
+
+    table.store(first, 0, None, 1, "exact")
+    table.store(hash, 1, None, 1, "exact")
+    index = slots(table, first)[0][0]
+    table.table[index] = table.table[index + 1] = 0
+
+    table.store(hash, 2, None, 2, "exact")
+
+    assert [table.table[i] ^ data for i, data in slots(table, hash)].count(hash) == 1
+    assert table.probe(hash)["score"] == 2
+
+
+def test_store_keeps_deeper_entry():
+    table = TranspositionTable(1)
+    hash = 777
+    move = chess.Move.from_uci("d2d4")
+
+    table.store(hash, 1, move, 6, "lowerbound")
+    table.store(hash, 2, None, 0, "upperbound")
+    assert table.probe(hash) == {"score": 1, "best_move": move, "depth": 6, "type": "lowerbound"}
+
+    # Exact results replace it, keeping its best move if they have none
+    table.store(hash, 3, None, 0, "exact")
+    assert table.probe(hash) == {"score": 3, "best_move": move, "depth": 0, "type": "exact"}
+
+    # So do results of a later search
+    table.store(hash, 4, None, 8, "lowerbound")
+    table.new_search()
+    table.store(hash, 5, None, 1, "upperbound")
+    assert table.probe(hash)["score"] == 5
+
+
+def test_store_replaces_shallowest():
+    table = TranspositionTable(1)
+    hash = 4242
+    others = same_bucket(table, hash, tt.BUCKET_SIZE)
+
+    for depth, other in enumerate(others):
+        table.store(other, 0, None, 10 - depth, "exact")
+
+    table.store(hash, 1, None, 5, "exact")
+
+    assert table.probe(hash) is not None
+    assert table.probe(others[-1]) is None
+    assert all(table.probe(other) is not None for other in others[:-1])
+
+
+def test_file_reopen(tmp_path):
+    filepath = str(tmp_path / "transpositions.bin")
+    table = TranspositionTable.open(filepath, KEY_DIGEST, size_mb=1)
+    table.new_search()
+    entries = {hash * 0x9E3779B97F4A7C15 % 2 ** 64: (hash / 8, chess.Move(hash % 64, (hash + 9) % 64), hash % 20)
+               for hash in range(1, 500)}
+
+    for hash, (score, move, depth) in entries.items():
+        table.store(hash, score, move, depth, "exact")
+
+    generation = table.generation
+    table.close()
+
+    table = TranspositionTable.open(filepath, KEY_DIGEST, size_mb=1)
+
+    assert table.generation == generation
+    for hash, (score, move, depth) in entries.items():
+        assert table.probe(hash) == {"score": score, "best_move": move, "depth": depth, "type": "exact"}
+
+    table.close()
+
+    # A table built with other Zobrist keys is never probed
+    table = TranspositionTable.open(filepath, b"\x01" * 32, size_mb=1)
+    assert all(table.probe(hash) is None for hash in entries)
+    table.close()
@@ -0,0 +1,25 @@
+import numpy as np
+
+import tune
+import utils
+from evaluate_batch import boards_to_bitboards
+from evaluate_position import static_score
+from positions import random_positions
+
+
+def test_features_match_scalar():
+    """The tuner's features times the current weights must be the engine's own evaluation, or it tunes something else."""
+    boards = random_positions(500, seed=2, max_plies=160)
+    features = tune.encode_features(boards_to_bitboards(boards))
+    weights = tune.config_to_weights(utils.load_constants())
+    expected = np.array([static_score(board) for board in boards])
+
+    np.testing.assert_allclose(tune.scores(features, weights), expected, atol=1e-3)
+
+
+def test_weights_round_trip():
+    constants = utils.load_constants()
+    weights = tune.config_to_weights(constants)
+
+    np.testing.assert_array_equal(tune.config_to_weights(tune.weights_to_config(constants, weights, decimals=6)),
+                                  weights)
@@ -0,0 +1,114 @@
+import chess
+import chess.polyglot
+import pytest
+
+import utils
+from errors import ZobristHashMismatch
+from positions import random_positions
+from utils.zobrist_hash import compute_hash
+
+
+def assert_matches(hash, board):
+    assert hash.current_hash == chess.polyglot.zobrist_hash(board), board.fen()
+
+
+def play(board, hash, move):
+    hash.move(move, board)
+    board.push(move)
+    assert_matches(hash, board)
+
+
+def undo(board, hash):
+    move = board.pop()
+    hash.pop(move, board)
+    assert_matches(hash, board)
+
+
+def test_compute_hash_matches_polyglot():
+    for board in random_positions(200):
+        assert compute_hash(board) == chess.polyglot.zobrist_hash(board)
+
+
+def test_incremental_hash_over_random_games(rng):
+    """Random moves, null moves and takebacks, checked against the hash computed by python-chess after each one."""
+    for _ in range(40):
+        board = chess.Board()
+        hash = utils.ZobristHash(board)
+
+        for _ in range(150):
+            moves = list(board.legal_moves)
+
+            if not moves or board.is_insufficient_material():
+                break
+
+            roll = rng.random()
+
+            if roll < 0.1 and board.move_stack:
+                undo(board, hash)
+            elif roll < 0.15 and not board.is_check():
+                play(board, hash, chess.Move.null())
+            else:
+                play(board, hash, rng.choice(moves))
+
+        while board.move_stack:
+            undo(board, hash)
+
+        assert hash.stack == []
+        assert hash.null_moves == []
+
+
+@pytest.mark.parametrize("fen, uci", [
+    ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "e1g1"),  # Kingside castling
+    ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "e1c1"),  # Queenside castling
+    ("r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1", "e8c8"),
+    ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "a1a8"),  # Capturing a rook removes both sides' rights
+    ("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1", "e1e2"),  # King moves lose both rights
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 2", "e5d6"),  # En passant
+    ("4k3/8/8/8/3Pp3/8/8/4K3 b - d3 0 2", "e4d3"),
+    ("4k3/8/8/8/8/8/3p4/4K3 w - - 0 1", "e1d2"),  # Capturing a pawn
+    ("4k3/3p4/8/4P3/8/8/8/4K3 b - - 0 1", "d7d5"),  # Double push next to an enemy pawn sets the ep key
+    ("4k3/3p4/8/8/8/8/8/4K3 b - - 0 1", "d7d5"),  # Double push without one doesn't
+    ("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1", "a7a8q"),  # Promotion
+    ("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1", "a7b8n"),  # Promotion with capture
+    ("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 2", "0000"),  # Null move drops the en passant key
+])
+def test_special_moves(fen, uci):
+    board = chess.Board(fen)
+    hash = utils.ZobristHash(board, debug=True)
+
+    play(board, hash, chess.Move.from_uci(uci))
+    undo(board, hash)
+
+
+def test_debug_detects_mismatch():
+    board = chess.Board()
+    hash = utils.ZobristHash(board, debug=True)
+    hash.current_hash ^= 1
+
+    with pytest.raises(ZobristHashMismatch):
+        hash.move(chess.Move.from_uci("e2e4"), board)
+
+
+def test_repetition_includes_history_before_search():
+    board = chess.Board()
+
+    for uci in ("g1f3", "g8f6", "f3g1", "f6g8"):
+        board.push_uci(uci)
+
+    hash = utils.ZobristHash(board)
+    assert hash.is_repetition(board.halfmove_clock)
+
+    move = chess.Move.from_uci("e2e4")
+    hash.move(move, board)
+    board.push(move)
+    assert not hash.is_repetition(board.halfmove_clock)
+
+
+def test_repetition_not_across_null_move():
+    board = chess.Board()
+    hash = utils.ZobristHash(board)
+
+    for uci in ("g1f3", "0000", "f3g1", "0000"):
+        play(board, hash, chess.Move.from_uci(uci))
+
+    assert not hash.is_repetition(board.halfmove_clock)
@@ -0,0 +1,143 @@
+import time
+
+import utils
+from errors import SearchAborted
+
+constants = utils.load_constants()
+
+POLL_INTERVAL = 256  # Nodes between checks of the clock and stop flags, must be a power of two
+
+
+class TimeManager:
+    def __init__(self, hard_limit=None, soft_limit=None, *, max_nodes=None, max_depth=None, abort_flag=None):
+        """
+        Decides when a search stops. The search calls count_node() at every node, which raises SearchAborted once the
+        hard limit passes, the node limit is reached, stop() is called or abort_flag is set. Between iterations,
+        find_move asks can_start_iteration() whether the next iteration is likely to finish in time.
+        :param hard_limit: Seconds after which the search is aborted, or None for no limit
+        :param soft_limit: Seconds after which no new iteration is started. Defaults to soft_time_ratio of hard_limit.
+        :param max_nodes: Nodes after which the search is aborted, or None for no limit
+        :param max_depth: Depth after which no new iteration is started, or None for no limit
+        :param abort_flag: Event (e.g. a multiprocessing.Event) that aborts the search when set
+        """
+        self.start_time = time.time()
+        self.hard_limit = hard_limit
+        self.soft_limit = soft_limit if soft_limit is not None or hard_limit is None \
+            else hard_limit * constants.soft_time_ratio
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.abort_flag = abort_flag
+
+        self.nodes = 0
+        self.qnodes = 0  # Quiescence search nodes, also counted in nodes
+        self.stopped = False
+        self.iterations = []  # (depth, nodes, seconds) of each completed iteration
+
+    @staticmethod
+    def from_clock(remaining, increment=0, moves_to_go=None, *, max_nodes=None):
+        """
+        Budgets a move from the engine's clock.
+        :param remaining: Seconds left on the clock
+        :param increment: Seconds added after each move
+        :param moves_to_go: Moves until the next time control, or None for sudden death
+        """
+        remaining = max(0, remaining - constants.move_overhead)
+        moves = moves_to_go or constants.expected_moves_to_go
+
+        soft_limit = min(remaining / moves + increment * 0.75, remaining * 0.5)
+        hard_limit = min(soft_limit * 3, remaining * 0.8)
+
+        return TimeManager(hard_limit, soft_limit, max_nodes=max_nodes)
+
+    def elapsed(self):
+        return time.time() - self.start_time
+
+    def stop(self):
+        """Aborts the search at the next poll. Safe to call from another thread."""
+        self.stopped = True
+
+    def ponderhit(self, hard_limit, soft_limit=None, max_depth=None):
+        """
+        Puts an unlimited (pondering) search on the clock, starting now. Safe to call from another thread.
+        :param hard_limit: Seconds from now after which the search is aborted
+        :param soft_limit: Seconds from now after which no new iteration is started, defaults as in __init__
+        :param max_depth: Depth after which no new iteration is started
+        """
+        # Keep the iteration times consistent with the new start, they are still needed to predict the next iteration
+        now = time.time()
+        shift = now - self.start_time
+        self.iterations = [(depth, nodes, seconds - shift) for depth, nodes, seconds in self.iterations]
+        self.start_time = now
+
+        self.soft_limit = soft_limit if soft_limit is not None else hard_limit * constants.soft_time_ratio
+        self.hard_limit = hard_limit
+        self.max_depth = max_depth
+
+    def count_node(self):
+        """Counts a node, aborting the search if it has to stop."""
+        self.nodes += 1
+
+        if self.nodes & (POLL_INTERVAL - 1):
+            return
+
+        if self.stopped or (self.abort_flag is not None and self.abort_flag.is_set()):
+            raise SearchAborted
+
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise SearchAborted
+
+        # Never abort the first iteration on time, so there is always a move to play
+        if self.hard_limit is not None and self.iterations and self.elapsed() >= self.hard_limit:
+            raise SearchAborted
+
+    def count_qnode(self):
+        """Counts a quiescence search node."""
+        self.qnodes += 1
+        self.count_node()
+
+    def iteration_completed(self, depth):
+        self.iterations.append((depth, self.nodes, self.elapsed()))
+
+    def effective_branching_factor(self):
+        """Ratio of the nodes of the last two iterations, or None before two iterations complete."""
+        if len(self.iterations) < 2:
+            return None
+
+        before = self.iterations[-3][1] if len(self.iterations) > 2 else 0
+        previous_nodes = self.iterations[-2][1] - before
+        last_nodes = self.iterations[-1][1] - self.iterations[-2][1]
+
+        if previous_nodes <= 0:
+            return None
+
+        return max(1.0, last_nodes / previous_nodes)
+
+    def predict_next_iteration(self):
+        """Seconds the next iteration is expected to take."""
+        if not self.iterations:
+            return 0
+
+        previous_seconds = self.iterations[-2][2] if len(self.iterations) > 1 else 0
+        last_seconds = self.iterations[-1][2] - previous_seconds
+        branching_factor = self.effective_branching_factor() or constants.default_branching_factor
+
+        return last_seconds * branching_factor
+
+    def can_start_iteration(self):
+        """Whether another iteration should be started."""
+        if self.stopped or (self.abort_flag is not None and self.abort_flag.is_set()):
+            return False
+
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            return False
+
+        if self.max_depth is not None and self.iterations and self.iterations[-1][0] >= self.max_depth:
+            return False
+
+        elapsed = self.elapsed()
+
+        if self.soft_limit is not None and elapsed >= self.soft_limit:
+            return False
+
+        # Don't start an iteration that is not expected to finish before the hard limit
+        return self.hard_limit is None or elapsed + self.predict_next_iteration() < self.hard_limit
@@ -1,119 +1,402 @@
-import hashlib
+import mmap
+import os
+import struct
+from array import array
+from multiprocessing import shared_memory
+
 import chess
-import json
-import threading
 import utils
-import copy
 
 constants = utils.load_constants()
 
+BUCKET_SIZE = 4  # Slots per bucket, one bucket is 64 bytes (a cache line)
+SLOT_WORDS = 2  # Each slot is a check word (key XOR data) followed by a data word
+
+# Bound types, stored in 2 bits. 0 marks an empty slot.
+BOUND_NONE = 0
+BOUND_EXACT = 1
+BOUND_LOWER = 2
+BOUND_UPPER = 3
+
+BOUND_TYPES = {
+    "exact": BOUND_EXACT,
+    "lowerbound": BOUND_LOWER,
+    "upperbound": BOUND_UPPER
+}
+BOUND_NAMES = {value: name for name, value in BOUND_TYPES.items()}
+
+# Data word layout (low to high bits):
+# move (15) | depth + 128 (8) | bound (2) | generation (7) | score * SCORE_SCALE + 2 ** 31 (32)
+DEPTH_SHIFT = 15
+BOUND_SHIFT = 23
+GENERATION_SHIFT = 25
+SCORE_SHIFT = 32
+
+MOVE_MASK = 0x7FFF
+GENERATION_MASK = 0x7F
+
+SCORE_SCALE = 1000  # Scores are stored in thousandths of a pawn
+SCORE_OFFSET = 2 ** 31
+SCORE_MATE = 2 ** 31 - 1  # Stands in for an infinite (mate) score
+
+# On-disk format: a 64-byte header followed by the table words exactly as they are laid out in memory.
+# The header records the Zobrist key set the entries were hashed with, so a file built with other keys is never probed.
+FILE_MAGIC = b"TFTT"
+FILE_VERSION = 4  # 3: scores are from the side to move's perspective, 4: hashes include the side to move
+HEADER = struct.Struct("<4sHHHBxQ32s")  # magic, version, bucket size, slot words, generation, buckets, key digest
+HEADER_SIZE = 64
+
+
+def pack_move(move):
+    """Packs a chess.Move into 15 bits. None and the null move pack to 0."""
+    if not move:
+        return 0
+
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def unpack_move(packed):
+    if not packed:
+        return None
+
+    return chess.Move(packed & 63, (packed >> 6) & 63, (packed >> 12) or None)
+
+
+def pack_score(score):
+    if score == float('inf'):
+        return SCORE_MATE
+    elif score == float('-inf'):
+        return -SCORE_MATE
+
+    return max(-SCORE_MATE + 1, min(SCORE_MATE - 1, round(score * SCORE_SCALE)))
+
+
+def unpack_score(packed):
+    if packed == SCORE_MATE:
+        return float('inf')
+    elif packed == -SCORE_MATE:
+        return float('-inf')
+
+    return packed / SCORE_SCALE
+
 
 class TranspositionTable:
-    def __init__(self):
+    def __init__(self, size_mb=constants.hash_size_mb, *, buffer=None):
         """
-        A transposition table which uses Zobrist hashing. Compatible with Lazy SMP.
+        A fixed-size transposition table which uses Zobrist hashing. Entries live in a preallocated array of 64-bit
+        words, grouped into buckets of BUCKET_SIZE slots. Each slot holds one packed data word (move, score, depth,
+        bound and generation) and the 64-bit Zobrist key XORed with that data word.
+
+        The XOR makes the table lockless: when several processes share it, a slot torn by two concurrent stores no
+        longer verifies against either key, so it is treated as missing instead of returning mixed data.
+        :param size_mb: Size of the table in megabytes, rounded down to a power of two number of buckets
+        :param buffer: Writable buffer to use as the table instead of allocating one (e.g. a memory map)
         """
-        self.table = {}
-        self.TABLESIZE = 2 ** 20
 
-    def skim_table(self):
-        """
-        Deletes some entries to optimize RAM. This affects self.table AND returns the new skimmed table
-        """
+        if buffer is None:
+            num_buckets = buckets_for_size(size_mb)
+            self.table = array('Q', [0]) * (num_buckets * BUCKET_SIZE * SLOT_WORDS)
+        else:
+            self.table = memoryview(buffer).cast('Q')
+            num_buckets = len(self.table) // (BUCKET_SIZE * SLOT_WORDS)
 
-        entries = self.table.values()
+        self.num_buckets = num_buckets
+        self.bucket_mask = num_buckets - 1
+        self.generation = 0
 
-        # Calculate total overflow, if any
-        overflow = len(entries) - constants["max_transposition_entries"]
+        # Only set for tables opened from a file
+        self.mmap = None
+        self.file = None
+        self.filepath = None
+        self.key_digest = None
+        self.dirty = None
 
-        if overflow <= 0:
-            return
+        # Only set for tables in shared memory
+        self.shared_memory = None
+        self.owns_shared_memory = False
+
+        self.stats = None  # SearchStats counting probes and hits, if the search collects them
+
+    @property
+    def size_mb(self):
+        return self.num_buckets * BUCKET_SIZE * SLOT_WORDS * 8 / (1024 * 1024)
 
-        sorted_entries = sorted(entries, key=lambda x: x["depth"], reverse=True)  # Sort based on depth
-        del sorted_entries[-overflow:]
+    def new_search(self):
+        """Starts a new search generation, so entries from older searches are replaced first."""
+        self.generation = (self.generation + 1) & GENERATION_MASK
 
-        self.table = sorted_entries
+    def clear(self):
+        self.table[:] = array('Q', [0]) * len(self.table)
+        self.generation = 0
 
-        return self.table
+        if self.dirty is not None:
+            self.dirty[:] = b"\x01" * self.num_buckets
 
-    def get_raw_table(self):
+    def hashfull(self, sample_buckets=250):
+        """Permille of slots used by the current search, estimated from the first sample_buckets buckets."""
+        table = self.table
+        sample_buckets = min(sample_buckets, self.num_buckets)
+        used = 0
+
+        for i in range(1, sample_buckets * BUCKET_SIZE * SLOT_WORDS, SLOT_WORDS):
+            data = table[i]
+
+            if (data >> BOUND_SHIFT) & 3 != BOUND_NONE and (data >> GENERATION_SHIFT) & GENERATION_MASK == self.generation:
+                used += 1
+
+        return used * 1000 // (sample_buckets * BUCKET_SIZE)
+
+    def probe(self, hash):
         """
-        Converts all chess.Moves to UCI format.
-        :return: dict
+        Looks up a position.
+        :param hash: 64-bit Zobrist hash of the position
+        :return: dict with score, best_move, depth and type, or None if the position is not stored
         """
+        table = self.table
+        stats = self.stats
+        base = (hash & self.bucket_mask) * BUCKET_SIZE * SLOT_WORDS
 
-        raw_table = {}
+        if stats is not None:
+            stats.tt_probes += 1
 
-        for key, values in self.table.items():
-            if isinstance(values["best_move"], chess.Move):
-                values["best_move"] = values["best_move"].uci()
-            else:
-                values["best_move"] = values["best_move"]
+        for i in range(base, base + BUCKET_SIZE * SLOT_WORDS, SLOT_WORDS):
+            data = table[i + 1]
 
-            raw_table[key] = values
+            if table[i] ^ data == hash:
+                bound = (data >> BOUND_SHIFT) & 3
 
-        return raw_table
+                if bound == BOUND_NONE:
+                    return None
 
-    def serialize(self, filepath, *, skim=True):
+                if stats is not None:
+                    stats.tt_hits += 1
+
+                return {
+                    "score": unpack_score((data >> SCORE_SHIFT) - SCORE_OFFSET),
+                    "best_move": unpack_move(data & MOVE_MASK),
+                    "depth": ((data >> DEPTH_SHIFT) & 0xFF) - 128,
+                    "type": BOUND_NAMES[bound]
+                }
+
+        return None
+
+    def store(self, hash, score, best_move, depth, type):
         """
-        Dump self.table into a JSON file
-        :param skim: Whether to skim the table.
-        :param filepath: Filepath to dump into
+        Stores a position. Within the bucket, a slot with the same key is overwritten, unless it holds a deeper result
+        of the current search and the new one is not exact. Otherwise the first empty slot is used, or the slot with
+        the lowest depth, counting older generations as shallower, is replaced.
+        :param hash: 64-bit Zobrist hash of the position
+        :param score: Score of the search, from the side to move's perspective
+        :param best_move: Best move found, or None
+        :param depth: Depth searched
+        :param type: "exact", "lowerbound" or "upperbound"
         """
+        table = self.table
+        generation = self.generation
+        bucket = hash & self.bucket_mask
+        base = bucket * BUCKET_SIZE * SLOT_WORDS
 
-        if skim:
-            self.skim_table()
+        if self.dirty is not None:
+            self.dirty[bucket] = 1
 
-        with open(filepath, 'w') as f:
-            json.dump(self.get_raw_table(), f, indent=4)
+        empty = None
+        lowest = None
+        lowest_value = None
 
-    def dict_to_int(self, d):
-        # Use the hash of the string representation of the dictionary as the integer value
-        hash_val = hashlib.sha256(str(d).encode('utf-8')).hexdigest()
-        # Convert the hash value to an integer using base 16 (hexadecimal)
-        int_val = int(hash_val, 16)
-        return int_val
+        for i in range(base, base + BUCKET_SIZE * SLOT_WORDS, SLOT_WORDS):
+            data = table[i + 1]
 
-    def add_entry(self, hash, entry: dict):
-        index = hash % self.TABLESIZE  # Generate an index
-        key = hash ^ self.dict_to_int(entry)  # Use Lock-less XOR to generate a key
-        entry["key"] = key  # Set the key
+            if table[i] ^ data == hash:
+                # Keep a deeper entry from this search, unless the new one is exact
+                if (data >> GENERATION_SHIFT) & GENERATION_MASK == generation \
+                        and ((data >> DEPTH_SHIFT) & 0xFF) - 128 > depth and type != "exact":
+                    return
 
-        self.table[index] = entry
+                if best_move is None:
+                    # Keep the old best move, it is still the best guess for ordering
+                    best_move = unpack_move(data & MOVE_MASK)
 
-    def get_entry(self, hash):
-        index = hash % self.TABLESIZE
+                replace = i
+                break
 
-        if not self.entry_exists(hash):
-            raise KeyError(hash)
+            if not (data >> BOUND_SHIFT) & 3:
+                if empty is None:
+                    empty = i
 
-        entry = copy.copy(self.table[index])
-        del entry["key"]
+                continue
 
-        return entry
+            age = (generation - (data >> GENERATION_SHIFT)) & GENERATION_MASK
+            value = ((data >> DEPTH_SHIFT) & 0xFF) - 8 * age
 
-    def entry_exists(self, hash):
-        index = hash % self.TABLESIZE
+            if lowest_value is None or value < lowest_value:
+                lowest = i
+                lowest_value = value
+        else:
+            replace = empty if empty is not None else lowest
+
+        data = (
+            pack_move(best_move)
+            | (max(-128, min(127, depth)) + 128) << DEPTH_SHIFT
+            | BOUND_TYPES[type] << BOUND_SHIFT
+            | generation << GENERATION_SHIFT
+            | (pack_score(score) + SCORE_OFFSET) << SCORE_SHIFT
+        )
+        table[replace] = hash ^ data
+        table[replace + 1] = data
+
+    def flush(self):
+        """Writes the buckets stored since the last flush (and the header) back to the file, if the table has one."""
+        if self.mmap is None:
+            return
 
-        # Index doesn't exist
-        if index not in self.table:
-            return False
+        self.mmap[:HEADER_SIZE] = HEADER.pack(FILE_MAGIC, FILE_VERSION, BUCKET_SIZE, SLOT_WORDS, self.generation,
+                                              self.num_buckets, self.key_digest).ljust(HEADER_SIZE, b"\x00")
+        self.mmap.flush(0, HEADER_SIZE)
 
-        entry = copy.copy(self.table[index])
-        del entry["key"]
+        # Flush whole pages, merging runs of pages that contain dirty buckets
+        page_size = mmap.ALLOCATIONGRANULARITY
+        bucket_bytes = BUCKET_SIZE * SLOT_WORDS * 8
+        run_start = run_end = None
+        bucket = self.dirty.find(1)
 
-        if not (self.table[index]["key"] ^ self.dict_to_int(entry) == hash):
-            # Key doesn't match original hash
-            return False
-        else:
-            # Index exists, keys match
-            return True
+        while bucket != -1:
+            start = (HEADER_SIZE + bucket * bucket_bytes) // page_size * page_size
+            end = min(start + page_size, len(self.mmap))
+
+            if run_end != start:
+                if run_start is not None:
+                    self.mmap.flush(run_start, run_end - run_start)
+
+                run_start = start
+
+            run_end = end
+            bucket = self.dirty.find(1, (end - HEADER_SIZE) // bucket_bytes)
+
+        if run_start is not None:
+            self.mmap.flush(run_start, run_end - run_start)
+
+        self.dirty[:] = bytes(self.num_buckets)
+
+    def close(self):
+        """Releases a table opened with TranspositionTable.open or placed in shared memory, flushing it if mapped."""
+        if self.mmap is not None:
+            self.flush()
+            self.table.release()
+            self.mmap.close()
+            self.file.close()
+            self.mmap = None
+            self.file = None
+        elif self.shared_memory is not None:
+            self.table.release()
+            self.shared_memory.close()
+
+            if self.owns_shared_memory:
+                self.shared_memory.unlink()
+
+            self.shared_memory = None
+
+    def share(self):
+        """
+        Returns what another process needs to pass to TranspositionTable.attach to use this same table. In-memory
+        tables have to be moved into shared memory first, see TranspositionTable.create_shared.
+        """
+        if self.mmap is not None:
+            return "file", self.filepath, self.key_digest
+        elif self.shared_memory is not None:
+            return "shared_memory", self.shared_memory.name, self.num_buckets
+
+        raise ValueError("Only file-backed or shared memory tables can be shared")
 
     @staticmethod
-    def load(filepath):
-        self = TranspositionTable()
+    def attach(location):
+        """
+        Opens a table shared by another process.
+        :param location: The value returned by share() in the other process
+        :return: TranspositionTable
+        """
+        kind, name, arg = location
+
+        if kind == "file":
+            return TranspositionTable.open(name, arg)
 
-        with open(filepath, 'r') as f:
-            self.table = json.load(f)
+        memory = shared_memory.SharedMemory(name=name)
+        self = TranspositionTable(buffer=memory.buf[:arg * BUCKET_SIZE * SLOT_WORDS * 8])
+        self.shared_memory = memory
 
         return self
+
+    @staticmethod
+    def create_shared(size_mb=constants.hash_size_mb):
+        """Creates an empty table in shared memory. See share() and attach()."""
+        num_buckets = buckets_for_size(size_mb)
+        memory = shared_memory.SharedMemory(create=True, size=num_buckets * BUCKET_SIZE * SLOT_WORDS * 8)
+
+        self = TranspositionTable(buffer=memory.buf[:num_buckets * BUCKET_SIZE * SLOT_WORDS * 8])
+        self.shared_memory = memory
+        self.owns_shared_memory = True
+
+        return self
+
+    @staticmethod
+    def open(filepath, key_digest, size_mb=constants.hash_size_mb):
+        """
+        Opens a table backed by a memory-mapped file. Entries are read from disk lazily as they are probed, and stores
+        are written back by flush(). If the file does not exist, or was built with a different key set or layout, it
+        is replaced with an empty table of size_mb.
+        :param filepath: Filepath of the table
+        :param key_digest: Digest of the Zobrist key set in use
+        :param size_mb: Size of a newly created table
+        :return: TranspositionTable
+        """
+
+        num_buckets = None
+        generation = 0
+
+        if os.path.exists(filepath):
+            with open(filepath, 'rb') as f:
+                header = f.read(HEADER_SIZE)
+
+            if len(header) == HEADER_SIZE:
+                magic, version, bucket_size, slot_words, file_generation, file_buckets, file_digest = \
+                    HEADER.unpack_from(header)
+                expected_size = HEADER_SIZE + file_buckets * BUCKET_SIZE * SLOT_WORDS * 8
+
+                if (magic, version, bucket_size, slot_words, file_digest) == \
+                        (FILE_MAGIC, FILE_VERSION, BUCKET_SIZE, SLOT_WORDS, key_digest) \
+                        and os.path.getsize(filepath) == expected_size:
+                    num_buckets = file_buckets
+                    generation = file_generation
+
+        if num_buckets is None:
+            # Start from an empty table
+            num_buckets = buckets_for_size(size_mb)
+            os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+
+            with open(filepath, 'wb') as f:
+                f.write(HEADER.pack(FILE_MAGIC, FILE_VERSION, BUCKET_SIZE, SLOT_WORDS, 0, num_buckets,
+                                    key_digest).ljust(HEADER_SIZE, b"\x00"))
+                f.truncate(HEADER_SIZE + num_buckets * BUCKET_SIZE * SLOT_WORDS * 8)
+
+        file = open(filepath, 'r+b')
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_WRITE)
+
+        self = TranspositionTable(buffer=memoryview(mapped)[HEADER_SIZE:])
+        self.mmap = mapped
+        self.file = file
+        self.filepath = filepath
+        self.key_digest = key_digest
+        self.generation = generation
+        self.dirty = bytearray(num_buckets)
+
+        return self
+
+
+def buckets_for_size(size_mb):
+    """Returns the largest power of two number of buckets that fits in size_mb megabytes."""
+    bucket_bytes = BUCKET_SIZE * SLOT_WORDS * 8
+    num_buckets = 1
+
+    while num_buckets * 2 * bucket_bytes <= size_mb * 1024 * 1024:
+        num_buckets *= 2
+
+    return num_buckets
@@ -0,0 +1,266 @@
+import argparse
+import dataclasses
+import json
+import os
+import re
+
+import chess
+import numpy as np
+
+import utils
+from evaluate_batch import boards_to_bitboards, unpack_bitboards
+
+constants = utils.load_constants()
+
+FEATURES_FILEPATH = "assets/cache/tuning_features.npy"
+RESULTS_FILEPATH = "assets/cache/tuning_results.npy"
+SKIP_OPENING_PLIES = 8  # Early positions say little about the result and are mostly the same across games
+BATCH_SIZE = 65536  # Rows converted from int8 at a time, bounds memory when computing scores and gradients
+
+# Weights: piece values of pawn to queen (kings have none), then each piece map (64 squares, as in constants.json)
+NUM_VALUES = 5
+NUM_WEIGHTS = NUM_VALUES + 6 * 64
+RESULT_SCORES = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+
+
+def is_quiet(board):
+    """Whether the static evaluation of a position can be trusted: not in check, with no capture that wins material."""
+    if board.is_check():
+        return False
+
+    return not any(utils.see(board, move) > 0 for move in board.generate_legal_captures())
+
+
+def extract_positions(filepath=constants.games_filepath):
+    """
+    Replays each game of a move list file like games.txt, yielding its quiet positions with the game's result. Lines
+    without a result, or with moves that don't parse, are skipped.
+    :return: Generator of (chess.Board, result as 1, 0.5 or 0 for white)
+    """
+    with open(filepath, 'r') as f:
+        for line in f:
+            moves = line.split()
+
+            if not moves or moves[-1] not in RESULT_SCORES:
+                continue
+
+            result = RESULT_SCORES[moves[-1]]
+            board = chess.Board()
+
+            try:
+                for ply, san in enumerate(moves[:-1]):
+                    board.push_san(san)
+
+                    if ply + 1 >= SKIP_OPENING_PLIES and is_quiet(board):
+                        yield board.copy(stack=False), result
+            except ValueError:
+                continue
+
+
+def encode_features(bitboards):
+    """
+    Encodes positions as the count of each weight in their evaluation, so scores are features @ weights. White pieces
+    count +1 and black pieces -1; a piece on a square counts towards its piece value and its piece map entry, which is
+    square 63 - square for white and square for black, as in Config.piece_square_maps.
+    :param bitboards: (N, 12) uint64 array from evaluate_batch.boards_to_bitboards
+    :return: (N, NUM_WEIGHTS) int8 array
+    """
+    tensor = unpack_bitboards(bitboards).astype(np.int8)
+    white = tensor[:, :6]
+    black = tensor[:, 6:]
+
+    values = white[:, :NUM_VALUES].sum(axis=2) - black[:, :NUM_VALUES].sum(axis=2)
+    maps = white[:, :, ::-1] - black
+
+    return np.concatenate([values, maps.reshape(len(tensor), 6 * 64)], axis=1).astype(np.int8)
+
+
+def build_dataset(filepath=constants.games_filepath, print_progress=True):
+    """
+    Extracts and encodes every quiet position of the games, a batch at a time so the boards never all stay in memory.
+    :return: (features, results) arrays
+    """
+    features = []
+    results = []
+    boards = []
+
+    def flush():
+        features.append(encode_features(boards_to_bitboards(boards)))
+        boards.clear()
+
+        if print_progress:
+            print(f"\r{sum(len(batch) for batch in features)} positions", end='')
+
+    for board, result in extract_positions(filepath):
+        boards.append(board)
+        results.append(result)
+
+        if len(boards) == BATCH_SIZE:
+            flush()
+
+    if boards:
+        flush()
+
+    if print_progress:
+        print()
+
+    return np.concatenate(features), np.array(results, dtype=np.float32)
+
+
+def load_dataset(rebuild=False, filepath=constants.games_filepath):
+    """Loads the encoded positions from the .npy cache, building it first if it is missing or rebuild is set."""
+    if not rebuild and os.path.exists(FEATURES_FILEPATH) and os.path.exists(RESULTS_FILEPATH):
+        return np.load(FEATURES_FILEPATH, mmap_mode='r'), np.load(RESULTS_FILEPATH)
+
+    features, results = build_dataset(filepath)
+
+    os.makedirs(os.path.dirname(FEATURES_FILEPATH), exist_ok=True)
+    np.save(FEATURES_FILEPATH, features)
+    np.save(RESULTS_FILEPATH, results)
+
+    return features, results
+
+
+def config_to_weights(config):
+    values = [config.piece_values[piece_type] for piece_type in chess.PIECE_TYPES[:NUM_VALUES]]
+    maps = [config.piece_maps[piece_type] for piece_type in chess.PIECE_TYPES]
+
+    return np.concatenate([np.array(values, dtype=np.float64), np.array(maps, dtype=np.float64).reshape(6 * 64)])
+
+
+def weights_to_config(config, weights, decimals=2):
+    """:return: config with the piece values and piece maps replaced by weights"""
+    weights = np.round(weights, decimals)
+    values = (0,) + tuple(float(value) for value in weights[:NUM_VALUES]) + (config.piece_values[chess.KING],)
+    maps = ((0,) * 64,) + tuple(tuple(float(bonus) for bonus in piece_map)
+                                for piece_map in weights[NUM_VALUES:].reshape(6, 64))
+
+    return dataclasses.replace(config, piece_values=values, piece_maps=maps)
+
+
+def scores(features, weights):
+    """Evaluation of every position in pawns, positive is good for white."""
+    return np.concatenate([features[i:i + BATCH_SIZE].astype(np.float32) @ weights.astype(np.float32)
+                           for i in range(0, len(features), BATCH_SIZE)])
+
+
+def sigmoid(scores, k):
+    return 1 / (1 + np.exp(-k * scores))
+
+
+def loss(features, results, weights, k):
+    """Mean squared error between the results and the win probabilities predicted from the evaluations."""
+    return float(np.mean((results - sigmoid(scores(features, weights), k)) ** 2))
+
+
+def gradient(features, results, weights, k):
+    """Gradient of loss with respect to the weights."""
+    total = np.zeros(NUM_WEIGHTS, dtype=np.float64)
+
+    for i in range(0, len(features), BATCH_SIZE):
+        batch = features[i:i + BATCH_SIZE].astype(np.float32)
+        predicted = sigmoid(batch @ weights.astype(np.float32), k)
+        error = (predicted - results[i:i + BATCH_SIZE]) * predicted * (1 - predicted)
+
+        total += error @ batch
+
+    return total * 2 * k / len(features)
+
+
+def fit_k(features, results, weights, low=0.01, high=5.0, iterations=50):
+    """
+    Finds the sigmoid scale that best maps the current evaluation to results, by golden section search. Tuning then
+    keeps it fixed, so the weights stay in pawns instead of all scaling together.
+    """
+    ratio = (np.sqrt(5) - 1) / 2
+    position_scores = scores(features, weights)
+
+    def k_loss(k):
+        return float(np.mean((results - sigmoid(position_scores, k)) ** 2))
+
+    for _ in range(iterations):
+        a = high - ratio * (high - low)
+        b = low + ratio * (high - low)
+
+        if k_loss(a) < k_loss(b):
+            high = b
+        else:
+            low = a
+
+    return (low + high) / 2
+
+
+def tune(features, results, weights, k, epochs=200, learning_rate=0.01, print_progress=True):
+    """
+    Minimizes loss with Adam on full-batch gradients. The pawn value stays fixed as the unit of the evaluation, which
+    search margins are written in.
+    :return: The tuned weights
+    """
+    weights = weights.copy()
+    mask = np.ones(NUM_WEIGHTS)
+    mask[chess.PAWN - 1] = 0
+
+    first_moment = np.zeros(NUM_WEIGHTS)
+    second_moment = np.zeros(NUM_WEIGHTS)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+
+    for epoch in range(1, epochs + 1):
+        step = gradient(features, results, weights, k) * mask
+
+        first_moment = beta1 * first_moment + (1 - beta1) * step
+        second_moment = beta2 * second_moment + (1 - beta2) * step ** 2
+        weights -= learning_rate * (first_moment / (1 - beta1 ** epoch)) \
+            / (np.sqrt(second_moment / (1 - beta2 ** epoch)) + epsilon)
+
+        if print_progress and (epoch % 10 == 0 or epoch == epochs):
+            print(f"Epoch {epoch}: loss {loss(features, results, weights, k):.6f}")
+
+    return weights
+
+
+def format_constants(data):
+    """constants.json text, with each piece map written as 8 rows of 8 squares like the hand-written file."""
+    text = json.dumps(data, indent=2)
+
+    def format_map(match):
+        numbers = [number.strip() for number in match.group(1).split(',')]
+
+        if len(numbers) != 64:
+            return match.group(0)
+
+        rows = [", ".join(numbers[i:i + 8]) for i in range(0, 64, 8)]
+        return "[\n      " + ",\n      ".join(rows) + "\n    ]"
+
+    return re.sub(r'\[\s*((?:-?[\d.]+(?:e-?\d+)?,\s*)+-?[\d.]+(?:e-?\d+)?)\s*\]', format_map, text) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tunes piece values and piece maps on the positions of games.txt "
+                                                 "(Texel's method) and writes a new constants.json.")
+    parser.add_argument("--output", default="assets/json/constants.tuned.json",
+                        help="File to write the tuned constants to")
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--learning-rate", type=float, default=0.01)
+    parser.add_argument("--rebuild", action="store_true", help="Re-extract the positions instead of using the cache")
+    args = parser.parse_args()
+
+    features, results = load_dataset(args.rebuild)
+    weights = config_to_weights(constants)
+    k = fit_k(features, results, weights)
+
+    print(f"{len(features)} positions, K = {k:.3f}, loss {loss(features, results, weights, k):.6f}")
+
+    weights = tune(features, results, weights, k, args.epochs, args.learning_rate)
+    tuned = weights_to_config(constants, weights)
+
+    with open(args.output, 'w') as f:
+        f.write(format_constants(tuned.to_json()))
+
+    print("Piece values: " + ", ".join(f"{chess.piece_name(piece_type)} {tuned.piece_values[piece_type]}"
+                                       for piece_type in chess.PIECE_TYPES[:NUM_VALUES]))
+    print(f"Wrote {args.output}, play it against the current constants with "
+          f"match.py --constants2 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+import math
+import multiprocessing
+import sys
+import threading
+import time
+
+import chess
+
+import utils
+import minimax
+import opening_book
+from time_manager import TimeManager
+
+NAME = "TechFish"
+AUTHOR = "Filajabob"
+
+MAX_DEPTH = 64  # Depth of searches without a depth limit
+MAX_THREADS = 16
+
+
+def principal_variation(board, first_move, max_length):
+    """Follows the best moves stored in the transposition table from the root."""
+    board = board.copy()
+    pv = []
+    move = first_move
+
+    while move and len(pv) < max_length and board.is_legal(move):
+        pv.append(move)
+        board.push(move)
+
+        if board.is_repetition(2):
+            break
+
+        entry = minimax.transposition_table.probe(utils.ZobristHash(board).current_hash)
+        move = entry["best_move"] if entry is not None else None
+
+    return pv
+
+
+def format_score(score, turn, pv_length):
+    """UCI score from the side to move, in centipawns, or in moves to mate (estimated by the length of the PV)."""
+    if turn == chess.BLACK:
+        score = -score
+
+    if math.isinf(score):
+        moves = max(1, (pv_length + 1) // 2)
+        return f"mate {moves if score > 0 else -moves}"
+
+    return f"cp {round(score * 100)}"
+
+
+class UCIEngine:
+    def __init__(self, output=sys.stdout):
+        """
+        Speaks UCI over stdin / stdout. The engine stays loaded between searches, so the transposition table, opening
+        book and Zobrist keys are only set up once. Searches run in a background thread so stop and ponderhit can be
+        handled while searching.
+        :param output: Stream to write responses to
+        """
+        self.output = output
+        self.board = chess.Board()
+        self.own_book = True
+
+        self.search_thread = None
+        self.time_manager = None
+        self.clock_limits = None  # (hard, soft) seconds to switch to on ponderhit
+        self.waiting = threading.Event()  # Set when an infinite or pondering search may send its bestmove
+
+    def send(self, line):
+        print(line, file=self.output, flush=True)
+
+    def run(self, lines=sys.stdin):
+        for line in lines:
+            if not self.handle(line.strip()):
+                break
+
+        self.stop()
+        utils.stop_helpers()
+
+    def handle(self, line):
+        """
+        Handles one command.
+        :return: False once the engine should quit
+        """
+        if not line:
+            return True
+
+        command, *args = line.split()
+
+        if command == "uci":
+            self.send(f"id name {NAME}")
+            self.send(f"id author {AUTHOR}")
+            self.send(f"option name Hash type spin default {minimax.constants.hash_size_mb} min 1 max 4096")
+            self.send(f"option name Threads type spin default {minimax.num_helper_threads + 1} min 1 max {MAX_THREADS}")
+            self.send("option name Ponder type check default true")
+            self.send("option name OwnBook type check default true")
+            self.send("uciok")
+        elif command == "isready":
+            # Load (or on the very first run, build) the book now, so it doesn't eat into the first move's time
+            if self.own_book:
+                opening_book.get_book()
+
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.stop()
+            minimax.new_game()
+        elif command == "position":
+            self.stop()
+            self.set_position(args)
+        elif command == "go":
+            self.stop()
+            self.go(args)
+        elif command == "stop":
+            self.stop()
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "quit":
+            return False
+
+        return True
+
+    def set_option(self, args):
+        # setoption name <name> [value <value>], names and values may contain spaces
+        text = " ".join(args)
+        name, _, value = text.partition(" value ")
+        name = name.removeprefix("name ").strip().lower()
+        value = value.strip()
+
+        self.stop()
+
+        if name == "hash":
+            minimax.resize_transposition_table(int(value))
+        elif name == "threads":
+            minimax.num_helper_threads = max(0, min(int(value), MAX_THREADS) - 1)
+            utils.stop_helpers()  # Restarted with the new count on the next search
+        elif name == "ownbook":
+            self.own_book = value.lower() == "true"
+
+    def set_position(self, args):
+        if "moves" in args:
+            index = args.index("moves")
+            position, moves = args[:index], args[index + 1:]
+        else:
+            position, moves = args, []
+
+        if position[0] == "startpos":
+            self.board = chess.Board()
+        else:
+            self.board = chess.Board(" ".join(position[1:]))
+
+        for move in moves:
+            self.board.push_uci(move)
+
+    def go(self, args):
+        options = {}
+        flags = set()
+        i = 0
+
+        while i < len(args):
+            if args[i] in ("infinite", "ponder"):
+                flags.add(args[i])
+                i += 1
+            elif args[i] == "searchmoves":
+                break  # Not supported, search all moves
+            else:
+                options[args[i]] = int(args[i + 1])
+                i += 2
+
+        white = self.board.turn == chess.WHITE
+        remaining = options.get("wtime" if white else "btime")
+        max_depth = options.get("depth", MAX_DEPTH)
+        max_nodes = options.get("nodes")
+
+        if "movetime" in options:
+            clock = TimeManager(options["movetime"] / 1000, options["movetime"] / 1000, max_nodes=max_nodes)
+        elif remaining is not None:
+            clock = TimeManager.from_clock(remaining / 1000, options.get("winc" if white else "binc", 0) / 1000,
+                                           options.get("movestogo"), max_nodes=max_nodes)
+        else:
+            clock = TimeManager(max_nodes=max_nodes)
+
+        if "ponder" in flags:
+            # Search without limits until ponderhit, then switch to the clock
+            self.time_manager = TimeManager(max_nodes=max_nodes)
+            self.clock_limits = (clock.hard_limit, clock.soft_limit)
+        else:
+            self.time_manager = clock
+            self.clock_limits = None
+
+        self.waiting.clear()
+
+        if not flags:
+            self.waiting.set()
+
+        # No book move while pondering, the book is probed when the actual position is searched
+        allow_book = self.own_book and not flags
+        self.search_thread = threading.Thread(target=self.search, args=(self.board.copy(), max_depth, allow_book),
+                                              daemon=True)
+        self.search_thread.start()
+
+    def search(self, board, max_depth, allow_book):
+        """Body of the search thread. A bestmove is always sent, even if the search fails, so the GUI never hangs."""
+        try:
+            best_move = self.find_best_move(board, max_depth, allow_book)
+        except Exception as e:
+            self.send(f"info string Search failed: {e!r}")
+            legal_moves = list(board.legal_moves)
+            best_move = legal_moves[0] if legal_moves else None
+
+        # UCI doesn't allow a bestmove before stop or ponderhit when searching infinitely or pondering
+        self.waiting.wait()
+
+        if best_move is None:
+            self.send("bestmove 0000")
+            return
+
+        pv = principal_variation(board, best_move, 2)
+
+        if len(pv) > 1:
+            self.send(f"bestmove {best_move.uci()} ponder {pv[1].uci()}")
+        else:
+            self.send(f"bestmove {best_move.uci()}")
+
+    def find_best_move(self, board, max_depth, allow_book):
+        """
+        Searches board, sending an info line after each iteration.
+        :return: The best move, or None if the game is over
+        """
+        start_time = time.time()
+
+        if board.is_game_over():
+            return None
+
+        def on_iteration(depth, best_move, score, time_manager, stats):
+            pv = principal_variation(board, best_move, depth)
+            elapsed = time.time() - start_time
+            nps = int(time_manager.nodes / elapsed) if elapsed > 0 else 0
+
+            self.send(f"info depth {depth} score {format_score(score, board.turn, len(pv))} "
+                      f"nodes {time_manager.nodes} nps {nps} time {int(elapsed * 1000)} "
+                      f"hashfull {minimax.transposition_table.hashfull()} "
+                      f"pv {' '.join(move.uci() for move in pv)}")
+
+        result = minimax.find_move(board, max_depth, None, allow_book=allow_book, print_updates=False,
+                                   time_manager=self.time_manager, on_iteration=on_iteration,
+                                   on_warning=lambda warning: self.send(f"info string {warning}"))
+
+        return utils.parse_move(board, result["move"])
+
+    def stop(self):
+        """Stops the current search, if any, and waits for its bestmove."""
+        if self.search_thread is None:
+            return
+
+        self.time_manager.stop()
+        self.waiting.set()
+        self.search_thread.join()
+        self.search_thread = None
+
+    def ponderhit(self):
+        if self.search_thread is None or self.clock_limits is None:
+            return
+
+        hard_limit, soft_limit = self.clock_limits
+        self.clock_limits = None
+
+        if hard_limit is not None:
+            self.time_manager.ponderhit(hard_limit, soft_limit)
+
+        self.waiting.set()
+
+
+def main():
+    if "--startup-profile" in sys.argv:
+        utils.startup_profile("uci")
+        return
+
+    UCIEngine().run()
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    main()
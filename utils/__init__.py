@@ -1,17 +1,39 @@
+import importlib
+
 from .load_constants import load_constants
+from .config import Config
 from .material_balance import material_balance
-from .load_openings import load_openings
 from .generate_pgn import generate_pgn, generate_san_move_list
-from .evaluate_endgame import evaluate_endgame
 from .zobrist_hash import ZobristHash
-from .order_moves import order_moves
-from .timeout import timeout
-from .traced_thread import TracedThread
-from .helpers import start_helpers, kill_helpers
+from .move_picker import MovePicker, mvv_lva
 from .get_piece_value import get_piece_value
-from .is_quiescent import is_quiescent
 from .is_generator_empty import is_generator_empty
-from .see import see_capture, see
+from .see import see, see_ge
 from .extension import extension
 from .node_type import node_type
-from .save_game import save_game
\ No newline at end of file
+from .save_game import save_game
+from .parse_move import parse_move
+
+# Imported on first use, they pull in heavy dependencies (requests, sqlite3, multiprocessing) that most processes never
+# need
+_lazy = {
+    "load_openings": ".load_openings",
+    "evaluate_endgame": ".evaluate_endgame",
+    "timeout": ".timeout",
+    "TracedThread": ".traced_thread",
+    "start_helpers": ".helpers",
+    "search_helpers": ".helpers",
+    "kill_helpers": ".helpers",
+    "stop_helpers": ".helpers",
+    "startup_profile": ".startup_profile",
+}
+
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_lazy[name], __name__), name)
+    globals()[name] = value
+
+    return value
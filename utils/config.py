@@ -0,0 +1,85 @@
+from dataclasses import dataclass, field, fields
+
+import chess
+
+
+@dataclass(frozen=True)
+class Config:
+    """
+    The engine's settings from constants.json, parsed once. Piece values and piece maps are stored as tuples indexed by
+    piece type (index 0 is unused) instead of the JSON's string-keyed objects, and piece_square_maps holds each piece
+    map flipped for both colors, indexed [color][piece_type][square].
+    """
+
+    starting_fen: str
+    max_depth: int
+    time_limit: float
+    soft_time_ratio: float
+    move_overhead: float
+    expected_moves_to_go: int
+    default_branching_factor: float
+    space_value: float
+    king_safety: float
+    central_score: float
+    central_pawn_score: float
+    central_important_piece_score: float
+    repeat_score: float
+    opening_repeat_score: float
+    pawn_attack_score: float
+    maximum_python_ram_percentage: float
+    maximum_transposition_depth_diff: int
+    transpositions_filepath: str
+    persist_transpositions: bool
+    zobrist_debug: bool
+    games_filepath: str
+    book_filepath: str
+    book_max_ply: int
+    syzygy_path: str
+    tablebase_url: str
+    tablebase_timeout: float
+    tablebase_cache_filepath: str
+    tablebase_cache_entries: int
+    tablebase_prefetch: bool
+    hash_size_mb: int
+    num_helper_threads: int
+    quiescent_depth: int
+    lmr_sample: int
+    lmr_reduction: int
+    aspiration_window: float
+    R: int
+    null_move_depth_divisor: int
+    null_move_verification_depth: int
+    square_control: float
+    piece_values: tuple
+    piece_maps: tuple
+    piece_square_maps: tuple = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # Piece maps are written from white's side, rank 8 first
+        object.__setattr__(self, "piece_square_maps", (
+            tuple(tuple(piece_map[square] for square in chess.SQUARES) for piece_map in self.piece_maps),
+            tuple(tuple(piece_map[63 - square] for square in chess.SQUARES) for piece_map in self.piece_maps)
+        ))
+
+    @staticmethod
+    def from_json(data):
+        """
+        :param data: The parsed constants.json
+        :raises TypeError: If a setting is missing or unknown
+        """
+        data = dict(data)
+
+        data["piece_values"] = (0,) + tuple(data["piece_values"][str(piece_type)] for piece_type in chess.PIECE_TYPES)
+        data["piece_maps"] = ((0,) * 64,) + tuple(tuple(data["piece_maps"][str(piece_type)])
+                                                  for piece_type in chess.PIECE_TYPES)
+
+        return Config(**data)
+
+    def to_json(self):
+        """The settings in constants.json's format."""
+        data = {f.name: getattr(self, f.name) for f in fields(self) if f.init}
+
+        data["piece_values"] = {str(piece_type): self.piece_values[piece_type] for piece_type in chess.PIECE_TYPES}
+        data["piece_maps"] = {str(piece_type): list(self.piece_maps[piece_type]) for piece_type in chess.PIECE_TYPES}
+
+        return data
@@ -1,24 +1,18 @@
-import requests
-import json
 from errors import *
+from .tablebase import get_prober, MAX_PIECES
 
 
 def evaluate_endgame(board):
     """Evaluates and returns a move for a position when there are 7 pieces or less."""
 
-    if len(board.piece_map()) > 7:
+    if len(board.piece_map()) > MAX_PIECES:
         raise ValueError("Position has more than 7 pieces")
 
-    r = requests.get(f"http://tablebase.lichess.ovh/standard?fen={board.fen().replace(' ', '_')}")
+    prober = get_prober()
+    tablebase_eval = prober.probe(board)
 
-    if not r.ok:
-        # For some reason, tablebase lookup didn't work
-        raise TablebaseLookupError(f"tablebase.lichess.ovh returned a status of {r.status_code}; lookup failed")
-
-    try:
-        tablebase_eval = json.loads(r.content)
-    except json.decoder.JSONDecodeError:
-        raise Exception(r.content)
+    if not tablebase_eval["moves"]:
+        raise TablebaseLookupError(f"No legal moves in {board.fen()}")
 
     move = tablebase_eval["moves"][0]["san"]
 
@@ -36,9 +30,19 @@ def evaluate_endgame(board):
 
             eval = f"{tablebase_eval['category'].title()} for {ref_color}"
 
+    # Fetch the positions after each reply to our move, so the next lookup is a cache hit
+    board = board.copy()
+    board.push_san(move)
+    replies = []
+
+    for reply in board.legal_moves:
+        board.push(reply)
+        replies.append(board.copy(stack=False))
+        board.pop()
+
+    prober.prefetch(replies)
 
     return {
         "move": move,
         "eval": eval
     }
-
@@ -3,7 +3,7 @@ import utils
 
 
 def generate_san_move_list(board):
-    _board = chess.Board(fen=utils.load_constants()["starting_fen"])
+    _board = chess.Board(fen=utils.load_constants().starting_fen)
     moves = board.move_stack
 
     pgn = []
@@ -18,7 +18,7 @@ def generate_san_move_list(board):
 def generate_pgn(board):
     """Returns unnumbered PGN"""
 
-    _board = chess.Board(fen=utils.load_constants()["starting_fen"])
+    _board = chess.Board(fen=utils.load_constants().starting_fen)
     moves = board.move_stack
 
     pgn = ""
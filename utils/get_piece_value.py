@@ -7,4 +7,4 @@ def get_piece_value(piece):
     if piece is None:
         return
 
-    return constants["piece_values"][str(piece.piece_type)]
\ No newline at end of file
+    return constants.piece_values[piece.piece_type]
\ No newline at end of file
@@ -1,29 +1,142 @@
+import atexit
+import multiprocessing
+import queue
+
+import chess
 import utils
-import copy
+from errors import SearchAborted
 
 constants = utils.load_constants()
 
+helpers = []  # (process, task queue) of each running helper
+results = None
+abort_flag = None
+search_id = 0
+
+
+def helper_main(index, table_location, tasks, results, abort_flag):
+    """
+    Entry point of a helper process. Runs iterative deepening on each root it is sent, sharing the transposition table
+    with the main process, until it receives None. Even helpers start one ply deeper than odd ones, so the helpers
+    stagger their depths instead of all searching the same tree.
+    """
+    import minimax
+    from time_manager import TimeManager
+    from transposition_table import TranspositionTable
+
+    minimax.transposition_table = TranspositionTable.attach(table_location)
+
+    while True:
+        task = tasks.get()
+
+        if task is None:
+            break
+
+        task_id, generation, root_fen, moves, max_depth = task
+
+        board = chess.Board(root_fen)
+        for move in moves:
+            board.push(chess.Move.from_uci(move))
+
+        minimax.transposition_table.generation = generation
+        minimax.heuristics.age()
+        minimax.current_time_manager = TimeManager(abort_flag=abort_flag)
+
+        try:
+            for depth in range(1 + (index % 2 == 0), max_depth + 1):
+                search = minimax.minimax(board, depth, float('-inf'), float('inf'), hash=utils.ZobristHash(board),
+                                         root=board)
+
+                if search["best_move"]:
+                    results.put(("result", task_id, depth, search["best_move"].uci(), search["score"]))
+        except SearchAborted:
+            pass
+
+        results.put(("done", task_id, index))
+
+    minimax.transposition_table.close()
+
+
+def start_helpers(table_location, count):
+    """
+    Starts the helper processes, unless they are already running.
+    :param table_location: Shared transposition table, as returned by TranspositionTable.share()
+    :param count: Number of helper processes
+    """
+    global results, abort_flag
+
+    if helpers:
+        return
 
-def start_helpers(abort_flag, board, depth, alpha, beta, is_maximizing, zobrist_hash):
-    from minimax import minimax
+    results = multiprocessing.Queue()
+    abort_flag = multiprocessing.Event()
 
+    for i in range(count):
+        tasks = multiprocessing.Queue()
+        process = multiprocessing.Process(target=helper_main, args=(i, table_location, tasks, results, abort_flag),
+                                          daemon=True)
+        process.start()
+        helpers.append((process, tasks))
+
+    atexit.register(stop_helpers)
+
+
+def search_helpers(board, max_depth, generation):
+    """
+    Makes every helper start searching a root. The helpers search until kill_helpers is called.
+    :param board: Root position, its move stack is sent too so repetitions are detected
+    :param max_depth: Deepest iteration to search
+    :param generation: Transposition table generation of the search
+    """
+    global search_id
+
+    search_id += 1
     abort_flag.clear()
-    helpers = []
 
-    # Start helper threads
-    for i in range(constants["num_helper_threads"]):
-        if i % 2 == 0:
-            increment = 1
+    root_fen = board.root().fen()
+    moves = [move.uci() for move in board.move_stack]
+
+    for process, tasks in helpers:
+        tasks.put((search_id, generation, root_fen, moves, max_depth))
+
+
+def kill_helpers():
+    """
+    Aborts the helpers' current search and waits for them to stop.
+    :return: List of (depth, UCI move, score) for each iteration the helpers completed, deepest first
+    """
+    abort_flag.set()
+
+    completed = []
+    running = len(helpers)
+
+    while running:
+        try:
+            message = results.get(timeout=1)
+        except queue.Empty:
+            if all(process.is_alive() for process, tasks in helpers):
+                continue
+
+            break  # A helper died, don't wait for it
+
+        if message[1] != search_id:
+            # Left over from an earlier search
+            continue
+
+        if message[0] == "done":
+            running -= 1
         else:
-            increment = 0
+            completed.append(message[2:])
 
-        helper = utils.TracedThread(target=minimax, args=(copy.deepcopy(board), depth + increment, alpha, beta,
-                                                          is_maximizing, copy.deepcopy(zobrist_hash), True))
-        helpers.append(helper)
-        helper.start()
+    return sorted(completed, key=lambda x: x[0], reverse=True)
 
-    return helpers
 
+def stop_helpers():
+    """Shuts the helper processes down."""
+    for process, tasks in helpers:
+        tasks.put(None)
 
-def kill_helpers(abort_flag):
-    abort_flag.set()
+    for process, tasks in helpers:
+        process.join(timeout=5)
+
+    helpers.clear()
@@ -1,6 +1,18 @@
+import functools
 import json
+import os
 
+from .config import Config
 
+CONSTANTS_FILEPATH = "assets/json/constants.json"
+
+
+@functools.cache
 def load_constants():
-    with open("assets/json/constants.json", 'r') as f:
-        return json.load(f)
\ No newline at end of file
+    """
+    Parses the constants on the first call; later calls return the same Config. They are read from
+    assets/json/constants.json, or from the file named by the TECHFISH_CONSTANTS environment variable (e.g. to play a
+    tuned variant in a match).
+    """
+    with open(os.environ.get("TECHFISH_CONSTANTS", CONSTANTS_FILEPATH), 'r') as f:
+        return Config.from_json(json.load(f))
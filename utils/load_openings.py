@@ -1,7 +1,6 @@
-import requests
-import json
+from .load_constants import load_constants
 
 
 def load_openings():
-    with open("assets/json/games.txt", 'r') as f:
+    with open(load_constants().games_filepath, 'r') as f:
         return f.read().split('\n')
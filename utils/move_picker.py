@@ -0,0 +1,89 @@
+import chess
+from .see import see_ge
+
+
+def mvv_lva(board, move):
+    """Most valuable victim first, then least valuable attacker."""
+    if board.is_en_passant(move):
+        victim = chess.PAWN
+    else:
+        victim = board.piece_type_at(move.to_square)
+
+    return victim * 8 - board.piece_type_at(move.from_square)
+
+
+class MovePicker:
+    def __init__(self, board, moves, hash_move=None, killers=(), countermove=None, history=None):
+        """
+        Yields a node's moves best first, ordering each stage only once the previous ones are used up, since most nodes
+        cut off after a move or two. The stages are:
+        1. the hash move, if it is one of moves
+        2. captures that don't lose material (SEE >= 0), by MVV-LVA
+        3. killer moves, then the countermove, if they are one of moves
+        4. quiet moves, promotions first, then by history score
+        5. captures that lose material, by MVV-LVA
+        :param board: Position to pick moves in, it must not change while moves are picked
+        :param moves: The moves to pick from, e.g. NodeContext.legal_moves, or fewer after futility pruning
+        :param hash_move: Best move from the transposition table, may come from another position on a hash collision
+        :param killers: Quiet moves that caused cutoffs at the same ply, most recent first
+        :param countermove: Quiet move that refuted the opponent's last move before
+        :param history: Per color, a score for each from_square * 64 + to_square, higher is searched first
+        """
+        self.board = board
+        self.moves = moves
+        self.hash_move = hash_move
+        self.killers = killers
+        self.countermove = countermove
+        self.history = history
+
+    def __iter__(self):
+        board = self.board
+        allowed = set(self.moves)
+        searched = set()
+
+        hash_move = self.hash_move
+
+        if hash_move in allowed:
+            searched.add(hash_move)
+            yield hash_move
+
+        captures = []
+        quiets = []
+
+        for move in self.moves:
+            (captures if board.is_capture(move) else quiets).append(move)
+
+        captures.sort(key=lambda move: mvv_lva(board, move), reverse=True)
+        bad_captures = []
+
+        for move in captures:
+            if move in searched:
+                continue
+
+            if see_ge(board, move):
+                yield move
+            else:
+                bad_captures.append(move)
+
+        refutations = list(self.killers)
+
+        if self.countermove is not None:
+            refutations.append(self.countermove)
+
+        for move in refutations:
+            if move in allowed and move not in searched and not board.is_capture(move):
+                searched.add(move)
+                yield move
+
+        if self.history is not None:
+            history = self.history[board.turn]
+            quiets.sort(key=lambda move: (move.promotion or 0, history[move.from_square * 64 + move.to_square]),
+                        reverse=True)
+        else:
+            quiets.sort(key=lambda move: move.promotion or 0, reverse=True)
+
+        for move in quiets:
+            if move not in searched:
+                yield move
+
+        yield from bad_captures
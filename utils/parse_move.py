@@ -0,0 +1,9 @@
+def parse_move(board, move):
+    """
+    Parses a move returned by find_move, which is UCI for searched moves, but SAN for book and tablebase moves.
+    :return: chess.Move
+    """
+    try:
+        return board.parse_uci(move)
+    except ValueError:
+        return board.parse_san(move)
@@ -1,44 +1,173 @@
 import chess
-from .get_piece_value import get_piece_value
+from .load_constants import load_constants
 
+constants = load_constants()
 
-def get_lowest_valued_piece_square(board, squares):
-    lowest_value = float('inf')
-    lowest_square = None
+# Kings are never captured in an exchange, see least_valuable_attacker
+VALUES = tuple(value if piece_type != chess.KING else 0 for piece_type, value in enumerate(constants.piece_values))
 
-    for square in squares:
-        piece_value = get_piece_value(board.piece_at(square))
-        if piece_value < lowest_value:
-            lowest_value = piece_value
-            lowest_square = square
+_memo_key = None
+_memo = {}  # (from square, to square, threshold) -> result, for the position in _memo_key
 
-    return lowest_square
 
+def attackers_to(board, square, occupied):
+    """Pieces of both colors attacking square, with only the pieces in occupied blocking sliders."""
+    queens_and_rooks = board.queens | board.rooks
+    queens_and_bishops = board.queens | board.bishops
 
-def see(board, square):
-    value = 0
-    piece = get_lowest_valued_piece_square(board, board.attackers(board.turn, square))
+    return (
+        (chess.BB_KING_ATTACKS[square] & board.kings)
+        | (chess.BB_KNIGHT_ATTACKS[square] & board.knights)
+        | (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] & queens_and_rooks)
+        | (chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied] & queens_and_rooks)
+        | (chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied] & queens_and_bishops)
+        | (chess.BB_PAWN_ATTACKS[chess.BLACK][square] & board.pawns & board.occupied_co[chess.WHITE])
+        | (chess.BB_PAWN_ATTACKS[chess.WHITE][square] & board.pawns & board.occupied_co[chess.BLACK])
+    ) & occupied
 
-    if piece:
-        captured_piece = board.piece_at(square)
 
-        if not captured_piece: return 0  # TODO: Support en passant
+def least_valuable_attacker(board, attackers):
+    """:return: (square, piece type) of the least valuable piece in attackers"""
+    for piece_type, pieces in ((chess.PAWN, board.pawns), (chess.KNIGHT, board.knights),
+                               (chess.BISHOP, board.bishops), (chess.ROOK, board.rooks), (chess.QUEEN, board.queens),
+                               (chess.KING, board.kings)):
+        if attackers & pieces:
+            return chess.lsb(attackers & pieces), piece_type
 
-        board.push(chess.Move(piece, square))
-        value = max(0, get_piece_value(captured_piece) - see(board, square))
-        board.pop()
 
-    return value
+def start_exchange(board, move):
+    """:return: (value of the piece captured by move, occupied squares after the move, attackers of the target)"""
+    from_square = move.from_square
+    to_square = move.to_square
+    occupied = board.occupied ^ chess.BB_SQUARES[from_square]
 
+    victim = board.piece_type_at(to_square)
 
-def see_capture(move, board):
-    captured_piece = board.piece_at(move.to_square)
+    if victim is None and to_square == board.ep_square and board.pawns & chess.BB_SQUARES[from_square]:
+        # En passant, the captured pawn is behind the target square
+        victim = chess.PAWN
+        occupied ^= chess.BB_SQUARES[to_square - 8 if board.turn == chess.WHITE else to_square + 8]
 
-    if captured_piece is None:
-        return 0
+    return VALUES[victim] if victim else 0, occupied, attackers_to(board, to_square, occupied)
 
-    board.push(move)
-    value = get_piece_value(captured_piece) - see(board, move.to_square)
-    board.pop()
 
-    return value
+def memo(board, key):
+    """Looks up a result for the board's position, starting a new memo if the position changed."""
+    global _memo_key
+
+    position = (board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK], board.pawns, board.knights,
+                board.bishops, board.rooks, board.queens, board.turn, board.ep_square)
+
+    if position != _memo_key:
+        _memo_key = position
+        _memo.clear()
+
+    return _memo.get(key)
+
+
+def see(board, move):
+    """
+    Static exchange evaluation: the material the side to move wins with move, if both sides then keep recapturing on
+    the target square with their least valuable piece and either side may stop. Works on bitboards without pushing
+    moves, revealing sliders behind pieces that have captured. Pins are ignored, promotions count as a pawn.
+    :return: Material won in pawns, negative if move loses material. 0 for a quiet move that can't be captured.
+    """
+    key = (move.from_square, move.to_square, None)
+    value = memo(board, key)
+
+    if value is not None:
+        return value
+
+    to_square = move.to_square
+    captured, occupied, attackers = start_exchange(board, move)
+
+    gain = [captured]
+    on_square = VALUES[board.piece_type_at(move.from_square)]
+    side = not board.turn
+
+    while True:
+        side_attackers = attackers & board.occupied_co[side]
+
+        if not side_attackers:
+            break
+
+        square, piece_type = least_valuable_attacker(board, side_attackers)
+
+        if piece_type == chess.KING and attackers & board.occupied_co[not side]:
+            break  # The king can't capture onto a defended square
+
+        # Speculatively capture the piece on the square
+        gain.append(on_square - gain[-1])
+        on_square = VALUES[piece_type]
+        occupied ^= chess.BB_SQUARES[square]
+        attackers = attackers_to(board, to_square, occupied)
+        side = not side
+
+    # Each side only captures if it is better than stopping
+    for i in range(len(gain) - 1, 0, -1):
+        gain[i - 1] = -max(-gain[i - 1], gain[i])
+
+    _memo[key] = gain[0]
+
+    return gain[0]
+
+
+def see_ge(board, move, threshold=0):
+    """
+    Whether see(board, move) >= threshold, stopping as soon as the exchange can no longer change the answer.
+    :param threshold: Material in pawns
+    """
+    key = (move.from_square, move.to_square, threshold)
+    result = memo(board, key)
+
+    if result is not None:
+        return result
+
+    result = _see_ge(board, move, threshold)
+    _memo[key] = result
+
+    return result
+
+
+def _see_ge(board, move, threshold):
+    to_square = move.to_square
+    captured, occupied, attackers = start_exchange(board, move)
+
+    # swap is what the side to move would be left with over the threshold if the exchange stopped here
+    swap = captured - threshold
+
+    if swap < 0:
+        return False
+
+    swap = VALUES[board.piece_type_at(move.from_square)] - swap
+
+    if swap <= 0:
+        return True
+
+    side = board.turn
+    result = True
+
+    while True:
+        side = not side
+        side_attackers = attackers & board.occupied_co[side]
+
+        if not side_attackers:
+            break
+
+        result = not result
+        square, piece_type = least_valuable_attacker(board, side_attackers)
+
+        if piece_type == chess.KING:
+            # The king can only capture if the square is no longer defended
+            return not result if attackers & board.occupied_co[not side] else result
+
+        swap = VALUES[piece_type] - swap
+
+        # Stop once the side that just captured can't lose by it; ties go to the side to move
+        if swap <= 0 if result else swap < 0:
+            break
+
+        occupied ^= chess.BB_SQUARES[square]
+        attackers = attackers_to(board, to_square, occupied)
+
+    return result
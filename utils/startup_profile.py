@@ -0,0 +1,38 @@
+import subprocess
+import sys
+
+
+def startup_profile(module, top=25):
+    """
+    Prints how long importing module takes in a fresh interpreter, and the slowest imports it pulls in, using Python's
+    -X importtime.
+    :param module: Module to import, e.g. "uci"
+    :param top: Number of imports to list
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True,
+                             text=True)
+
+    if process.returncode != 0:
+        print(process.stderr, file=sys.stderr)
+        return
+
+    imports = []  # (cumulative microseconds, self microseconds, name)
+
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        own, cumulative, name = line.removeprefix("import time:").split("|")
+
+        if not own.strip().isdigit():
+            continue  # Header line
+
+        imports.append((int(cumulative), int(own), name.rstrip()))
+
+    total = next((cumulative for cumulative, own, name in imports if name.strip() == module), 0)
+
+    print(f"Importing {module} took {total / 1000:.1f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+
+    for cumulative, own, name in sorted(imports, reverse=True)[:top]:
+        print(f"{cumulative / 1000:>14.1f} {own / 1000:>9.1f}  {name}")
@@ -0,0 +1,267 @@
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import chess
+import chess.syzygy
+import requests
+from requests.adapters import HTTPAdapter
+
+from errors import TablebaseLookupError
+from .load_constants import load_constants
+
+constants = load_constants()
+
+MAX_PIECES = 7
+
+# Syzygy WDL values, from the side to move, as lichess result categories
+WDL_CATEGORIES = {
+    2: "win",
+    1: "cursed-win",
+    0: "draw",
+    -1: "blessed-loss",
+    -2: "loss"
+}
+
+
+def normalize_fen(board):
+    """Position key for tablebase results: the FEN without move counters, en passant only if it is legal."""
+    return board.epd()
+
+
+class TablebaseCache:
+    def __init__(self, filepath, max_entries):
+        """
+        A persistent least-recently-used cache of tablebase results, keyed by normalized FEN. Safe to use from several
+        threads.
+        :param filepath: SQLite database file
+        :param max_entries: Entries to keep; the least recently used are evicted beyond this
+        """
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filepath, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (fen TEXT PRIMARY KEY, result TEXT NOT NULL, "
+                                "last_used INTEGER NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.clock, self.size = self.connection.execute("SELECT COALESCE(MAX(last_used), 0), COUNT(*) FROM results") \
+            .fetchone()
+
+    def get(self, fen):
+        with self.lock:
+            row = self.connection.execute("SELECT result FROM results WHERE fen = ?", (fen,)).fetchone()
+
+            if row is None:
+                return None
+
+            self.clock += 1
+            self.connection.execute("UPDATE results SET last_used = ? WHERE fen = ?", (self.clock, fen))
+            self.connection.commit()
+
+        return json.loads(row[0])
+
+    def __contains__(self, fen):
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM results WHERE fen = ?", (fen,)).fetchone() is not None
+
+    def put(self, fen, result):
+        with self.lock:
+            self.clock += 1
+            exists = self.connection.execute("SELECT 1 FROM results WHERE fen = ?", (fen,)).fetchone() is not None
+            self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                                    (fen, json.dumps(result), self.clock))
+
+            if not exists:
+                self.size += 1
+
+            # Evicted by count, not by clock value, as lookups advance the clock too
+            if self.size > self.max_entries:
+                self.connection.execute("DELETE FROM results WHERE fen IN (SELECT fen FROM results ORDER BY last_used "
+                                        "LIMIT ?)", (self.size - self.max_entries,))
+                self.size = self.max_entries
+
+            self.connection.commit()
+
+
+class LichessTablebase:
+    def __init__(self, url, timeout, max_connections=8):
+        """
+        Remote tablebase lookups through the lichess tablebase API. Connections are pooled and reused.
+        :param url: Endpoint, e.g. http://tablebase.lichess.ovh/standard. A local stub server can be used instead.
+        :param timeout: Seconds to wait for a response
+        :param max_connections: Size of the connection pool, and number of concurrent prefetches
+        """
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.max_connections = max_connections
+
+    def probe(self, board):
+        """
+        :return: The lichess result for the position (category, dtz, dtm, and moves best first)
+        """
+        try:
+            r = self.session.get(self.url, params={"fen": board.fen()}, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise TablebaseLookupError(f"{self.url} lookup failed: {e}")
+
+        if not r.ok:
+            # For some reason, tablebase lookup didn't work
+            raise TablebaseLookupError(f"{self.url} returned a status of {r.status_code}; lookup failed")
+
+        try:
+            return r.json()
+        except ValueError:
+            raise TablebaseLookupError(f"{self.url} returned invalid JSON: {r.content[:100]}")
+
+
+class SyzygyTablebase:
+    def __init__(self, directory):
+        """
+        Local lookups in Syzygy tables, through python-chess.
+        :param directory: Directory containing the .rtbw and .rtbz files
+        """
+        self.tablebase = chess.syzygy.open_tablebase(directory)
+
+    def probe(self, board):
+        """
+        :return: A result in the same format as LichessTablebase.probe (without dtm)
+        """
+        if board.castling_rights:
+            raise TablebaseLookupError("Syzygy tables do not cover positions with castling rights")
+
+        try:
+            wdl = self.tablebase.probe_wdl(board)
+            dtz = self.tablebase.probe_dtz(board)
+            moves = []
+
+            for move in board.legal_moves:
+                san = board.san(move)
+                board.push(move)
+
+                checkmate = board.is_checkmate()
+
+                if checkmate:
+                    child_wdl, child_dtz = -2, 0
+                else:
+                    child_wdl = self.tablebase.probe_wdl(board)
+                    child_dtz = self.tablebase.probe_dtz(board)
+
+                board.pop()
+
+                moves.append({
+                    "uci": move.uci(),
+                    "san": san,
+                    "category": WDL_CATEGORIES[child_wdl],
+                    "dtz": child_dtz,
+                    "dtm": None,
+                    "checkmate": checkmate,
+                    "wdl": child_wdl
+                })
+        except (KeyError, chess.syzygy.MissingTableError) as e:
+            raise TablebaseLookupError(f"No Syzygy table for {board.fen()}: {e}")
+
+        # Best first: the worst result for the opponent, then mate, then win quickly or lose slowly
+        moves.sort(key=lambda x: (x["wdl"], not x["checkmate"], -x["dtz"]))
+
+        for move in moves:
+            del move["wdl"]
+
+        return {
+            "category": WDL_CATEGORIES[wdl],
+            "dtz": dtz,
+            "dtm": None,
+            "moves": moves
+        }
+
+
+class TablebaseProber:
+    def __init__(self, backends, cache=None, prefetch=True):
+        """
+        Probes tablebase backends in order, caching the results.
+        :param backends: Backends to try, e.g. a SyzygyTablebase then a LichessTablebase
+        :param cache: TablebaseCache, or None to not cache
+        :param prefetch: Whether prefetch() fetches anything
+        """
+        self.backends = backends
+        self.cache = cache
+        self.prefetching = prefetch
+        self.executor = None
+
+    def probe(self, board):
+        fen = normalize_fen(board)
+
+        if self.cache is not None:
+            result = self.cache.get(fen)
+
+            if result is not None:
+                return result
+
+        errors = []
+
+        for backend in self.backends:
+            try:
+                result = backend.probe(board)
+            except TablebaseLookupError as e:
+                errors.append(str(e))
+                continue
+
+            if self.cache is not None:
+                self.cache.put(fen, result)
+
+            return result
+
+        raise TablebaseLookupError("; ".join(errors) or "No tablebase backends available")
+
+    def prefetch(self, boards):
+        """
+        Starts probing positions in the background, so later lookups of them hit the cache.
+        :param boards: Positions to fetch, positions already cached or with too many pieces are skipped
+        """
+        if not self.prefetching or self.cache is None:
+            return
+
+        if self.executor is None:
+            max_workers = max([getattr(backend, "max_connections", 1) for backend in self.backends] + [1])
+            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        for board in boards:
+            if len(board.piece_map()) <= MAX_PIECES and normalize_fen(board) not in self.cache:
+                self.executor.submit(self._prefetch_one, board.copy(stack=False))
+
+    def _prefetch_one(self, board):
+        try:
+            self.probe(board)
+        except TablebaseLookupError:
+            pass
+
+
+_prober = None
+
+
+def get_prober():
+    """Returns the tablebase prober configured in constants.json, creating it on first use."""
+    global _prober
+
+    if _prober is None:
+        backends = []
+
+        if os.path.isdir(constants.syzygy_path):
+            backends.append(SyzygyTablebase(constants.syzygy_path))
+
+        backends.append(LichessTablebase(constants.tablebase_url, constants.tablebase_timeout))
+
+        cache = TablebaseCache(constants.tablebase_cache_filepath, constants.tablebase_cache_entries)
+        _prober = TablebaseProber(backends, cache, constants.tablebase_prefetch)
+
+    return _prober
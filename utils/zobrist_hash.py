@@ -1,105 +1,213 @@
+import hashlib
+
 import chess
-import random
-import json
-import utils
+import chess.polyglot
 
-constants = utils.load_constants()
+from errors import ZobristHashMismatch
+from .load_constants import load_constants
 
+constants = load_constants()
 
-class ZobristHash:
-    def __init__(self, board):
-        self.zobrist_array = {}
-        self.en_passant_squares = [
-            chess.A3, chess.B3, chess.C3, chess.D3, chess.E3, chess.F3, chess.G3, chess.H3,
-            chess.A6, chess.B6, chess.C6, chess.D6, chess.E6, chess.F6, chess.G6, chess.H6
-        ]
-        self.en_passant = []
+# Polyglot's keys, so hashes match chess.polyglot.zobrist_hash and are the same in every process and every run
+PIECE_KEYS = chess.polyglot.POLYGLOT_RANDOM_ARRAY[:768]  # Indexed ((piece_type - 1) * 2 + color) * 64 + square
+CASTLING_KEYS = {
+    chess.H1: chess.polyglot.POLYGLOT_RANDOM_ARRAY[768],
+    chess.A1: chess.polyglot.POLYGLOT_RANDOM_ARRAY[769],
+    chess.H8: chess.polyglot.POLYGLOT_RANDOM_ARRAY[770],
+    chess.A8: chess.polyglot.POLYGLOT_RANDOM_ARRAY[771],
+}
+EN_PASSANT_KEYS = chess.polyglot.POLYGLOT_RANDOM_ARRAY[772:780]  # Indexed by file
+TURN_KEY = chess.polyglot.POLYGLOT_RANDOM_ARRAY[780]  # In the hash while white is to move
+
+# Identifies the key set, so data built from these hashes (e.g. a saved transposition table) can be validated
+KEY_DIGEST = hashlib.sha256(b"polyglot" + b"".join(key.to_bytes(8, "little")
+                                                   for key in chess.polyglot.POLYGLOT_RANDOM_ARRAY)).digest()
+
+
+def piece_key(color, piece_type, square):
+    return PIECE_KEYS[((piece_type - 1) * 2 + color) * 64 + square]
+
+
+def castling_hash(castling_rights):
+    """:param castling_rights: Bitboard of the rooks' starting squares with castling rights, as in chess.Board"""
+    hash = 0
+
+    for square, key in CASTLING_KEYS.items():
+        if castling_rights & chess.BB_SQUARES[square]:
+            hash ^= key
+
+    return hash
+
+
+def en_passant_hash(board):
+    """Key of the en passant square, only if a pawn of the side to move stands next to the pawn it could capture."""
+    ep_square = board.ep_square
+
+    if ep_square is not None and chess.BB_PAWN_ATTACKS[not board.turn][ep_square] & board.pawns \
+            & board.occupied_co[board.turn]:
+        return EN_PASSANT_KEYS[chess.square_file(ep_square)]
+
+    return 0
+
+
+def compute_hash(board):
+    """The hash of a position computed from scratch, equal to chess.polyglot.zobrist_hash."""
+    hash = 0
+
+    for square, piece in board.piece_map().items():
+        hash ^= piece_key(piece.color, piece.piece_type, square)
+
+    hash ^= castling_hash(board.castling_rights)
+    hash ^= en_passant_hash(board)
 
-        for piece in chess.PIECE_TYPES:
-            # Create a dict for each piece, ready to fill with squares
-            self.zobrist_array[piece] = {}
+    if board.turn == chess.WHITE:
+        hash ^= TURN_KEY
 
-        for piece in chess.PIECE_TYPES:
-            for square in chess.SQUARES:
-                # Fill piece dicts with square keys
-                self.zobrist_array[piece][square] = random.getrandbits(64)
+    return hash
 
-        for en_passant_square in self.en_passant_squares:
-            self.en_passant.append(random.getrandbits(64))
 
-        self.current_hash = 0
+class ZobristHash:
+    key_digest = KEY_DIGEST
+
+    def __init__(self, board, debug=constants.zobrist_debug):
+        """
+        Keeps the hash of the board the search is on, updated from each move instead of rehashing the board. Call
+        move() before board.push(move) and pop() after board.pop(); the hashes before each move are kept on a stack, so
+        pop() just restores the previous one. The stack starts with the hashes of the board's earlier positions since
+        the last capture or pawn move, so repetitions of positions before the search are found too.
+        :param board: The position to start from
+        :param debug: Check every update against a hash computed from scratch, raising ZobristHashMismatch if it
+                      differs. Slow, for testing changes to the hashing.
+        """
+        self.current_hash = compute_hash(board)
+        self.stack = []
+        self.null_moves = []  # Stack length at each null move on the stack, repetitions can't span a null move
+        self.debug = debug
+
+        history = board.copy()
 
-        for square, piece in board.piece_map().items():
-            self.current_hash ^= self.zobrist_array[piece.piece_type][square]
+        for _ in range(min(board.halfmove_clock, len(board.move_stack))):
+            move = history.pop()
 
-        if board.ep_square is not None:
-            self.current_hash ^= self.en_passant[chess.square_file(board.ep_square)]
+            if not move:
+                break
 
-        self.zobrist_array[-1] = random.getrandbits(64)
+            self.stack.append(compute_hash(history))
+
+        self.stack.reverse()
 
     def move(self, move, board):
+        """
+        Updates the hash for a move that is about to be played.
+        :param move: chess.Move, or chess.Move.null() to pass
+        :param board: The board, before the move is pushed
+        :return: The new hash
+        """
         if not move:
-            # Null move, switch turn
-            if not board.turn:
-                # Update the hash to include who's turn it is
-                self.current_hash ^= self.zobrist_array["-1"]
+            self.null_moves.append(len(self.stack))
+
+        self.stack.append(self.current_hash)
 
-            return self.current_hash
+        # The side to move changes and the old en passant square goes away, even for a null move
+        hash = self.current_hash ^ TURN_KEY ^ en_passant_hash(board)
 
-        # Call Zobrist Hashing before the actual push
-        piece = board.piece_type_at(move.from_square)
+        if move:
+            turn = board.turn
+            from_square = move.from_square
+            to_square = move.to_square
+            piece_type = board.piece_type_at(from_square)
 
-        # XOR out the piece from its origin square
-        try:
-            self.current_hash ^= self.zobrist_array[piece][move.from_square]
-        except Exception as e:
-            print(board)
-            print(move)
-            raise e
+            hash ^= piece_key(turn, piece_type, from_square)
 
-        if board.is_capture(move):
-            if board.is_en_passant(move):
-                # XOR the en passant
-                self.current_hash ^= self.en_passant[self.en_passant_squares.index(move.to_square)]
+            if piece_type == chess.KING and abs(to_square - from_square) == 2:
+                # Castling, the king lands on the g or c file and the rook jumps over it
+                kingside = to_square > from_square
+                rank = chess.square_rank(from_square)
+                rook_from = chess.square(7 if kingside else 0, rank)
+                rook_to = chess.square(5 if kingside else 3, rank)
+                king_to = chess.square(6 if kingside else 2, rank)
 
+                hash ^= piece_key(turn, chess.KING, king_to)
+                hash ^= piece_key(turn, chess.ROOK, rook_from) ^ piece_key(turn, chess.ROOK, rook_to)
             else:
-                captured_piece = board.piece_type_at(move.to_square)
-
-                # XOR out the captured piece, if any
-                self.current_hash ^= self.zobrist_array[captured_piece][move.to_square]
-        if move.promotion:
-            # XOR out the pawn that promoted, if any
-            self.current_hash ^= self.zobrist_array[piece][move.to_square]
-
-            # XOR in the newly promoted piece
-            self.current_hash ^= self.zobrist_array[move.promotion][move.to_square]
-        else:
-            # Nothing special, XOR in the piece to its new square
-            self.current_hash ^= self.zobrist_array[piece][move.to_square]
-
-        # Castling logic
-        if board.is_castling(move):
-            if move.to_square == chess.G1:
-                self.current_hash ^= self.zobrist_array[chess.ROOK][chess.H1]
-                self.current_hash ^= self.zobrist_array[chess.ROOK][chess.F1]
-            elif move.to_square == chess.C1:
-                self.current_hash ^= self.zobrist_array[chess.ROOK][chess.A1]
-                self.current_hash ^= self.zobrist_array[chess.ROOK][chess.D1]
-            elif move.to_square == chess.G8:
-                self.current_hash ^= self.zobrist_array[chess.ROOK][chess.H8]
-                self.current_hash ^= self.zobrist_array[chess.ROOK][chess.F8]
-            elif move.to_square == chess.C8:
-                self.current_hash ^= self.zobrist_array[chess.ROOK][chess.A8]
-                self.current_hash ^= self.zobrist_array[chess.ROOK][chess.D8]
-
-        if not board.turn:
-            # Update the hash to include who's turn it is
-            self.current_hash ^= self.zobrist_array[-1]
+                captured = board.piece_type_at(to_square)
 
-        return self.current_hash
+                if captured:
+                    hash ^= piece_key(not turn, captured, to_square)
+                elif piece_type == chess.PAWN and to_square == board.ep_square:
+                    # En passant, the captured pawn is behind the target square
+                    hash ^= piece_key(not turn, chess.PAWN, to_square - 8 if turn == chess.WHITE else to_square + 8)
+
+                hash ^= piece_key(turn, move.promotion or piece_type, to_square)
+
+            # Moving from or to a rook's starting square, or moving the king, loses castling rights
+            castling_rights = board.castling_rights
+            remaining = castling_rights & ~chess.BB_SQUARES[from_square] & ~chess.BB_SQUARES[to_square]
+
+            if piece_type == chess.KING:
+                remaining &= ~(chess.BB_RANK_1 if turn == chess.WHITE else chess.BB_RANK_8)
 
-    def pop(self, move, board):
-        return self.move(move, board)
+            hash ^= castling_hash(castling_rights ^ remaining)
 
+            if piece_type == chess.PAWN and abs(to_square - from_square) == 16:
+                ep_square = (from_square + to_square) // 2
 
+                if chess.BB_PAWN_ATTACKS[turn][ep_square] & board.pawns & board.occupied_co[not turn]:
+                    hash ^= EN_PASSANT_KEYS[chess.square_file(ep_square)]
+
+        self.current_hash = hash
+
+        if self.debug:
+            self.verify(board, move)
+
+        return hash
+
+    def pop(self, move=None, board=None):
+        """
+        Restores the hash from before the last move, after board.pop().
+        :return: The restored hash
+        """
+        self.current_hash = self.stack.pop()
+
+        if self.null_moves and self.null_moves[-1] == len(self.stack):
+            self.null_moves.pop()
+
+        if self.debug and board is not None:
+            self.verify(board)
+
+        return self.current_hash
 
+    def is_repetition(self, halfmove_clock):
+        """
+        Whether the current position occurred before, since the last capture, pawn move or null move. The search
+        scores a position as a draw the first time it repeats, as the side that can repeat it can do so again.
+        :param halfmove_clock: The board's halfmove clock, positions further back can't be the same
+        """
+        stack = self.stack
+        start = len(stack) - halfmove_clock
+
+        if self.null_moves:
+            start = max(start, self.null_moves[-1] + 1)
+
+        # Only positions an even number of plies back have the same side to move
+        for i in range(len(stack) - 2, max(start, 0) - 1, -2):
+            if stack[i] == self.current_hash:
+                return True
+
+        return False
+
+    def verify(self, board, move=None):
+        """
+        Compares the hash with one computed from scratch.
+        :param move: Move about to be pushed, the hash is compared with the position after it
+        :raises ZobristHashMismatch: If they differ
+        """
+        if move is not None:
+            board = board.copy(stack=False)
+            board.push(move)
+
+        expected = compute_hash(board)
+
+        if self.current_hash != expected:
+            raise ZobristHashMismatch(f"Hash {self.current_hash:016x} after {move} should be {expected:016x} in "
+                                      f"{board.fen()}")